@@ -0,0 +1,45 @@
+import sys
+import time
+import tracemalloc
+
+from builders import rect_topology, cylinder_topology, torus_topology, hex_topology
+from engine import topology_from_compact
+
+
+BUILDERS = {
+    "rect": rect_topology,
+    "cylinder": cylinder_topology,
+    "torus": torus_topology,
+    "hex": hex_topology,
+}
+
+
+def measure(build, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    result = build(*args)
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def main(sides=(32, 100, 316, 1000)):
+    print(f"{'builder':10} {'tiles':>9} {'seconds':>9} {'bytes/tile':>11} {'peak/tile':>10}")
+
+    for name, builder in BUILDERS.items():
+        for side in sides:
+            topo, elapsed, peak = measure(builder, side, side)
+            print(f"{name:10} {topo.size:9} {elapsed:9.3f} {topo.nbytes() / topo.size:11.1f} {peak / topo.size:10.1f}")
+
+    # the object graph for comparison, only at the small sizes
+    for side in sides[:2]:
+        topo, elapsed, peak = measure(lambda n: topology_from_compact(rect_topology(n, n)), side)
+        print(f"{'objects':10} {len(topo.tiles):9} {elapsed:9.3f} {'':>11} {peak / len(topo.tiles):10.1f}")
+
+
+if __name__ == "__main__":
+    main(tuple(int(arg) for arg in sys.argv[1:]) or (32, 100, 316, 1000))
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+
+
+# modules workers and command line tools import; none of them may pull in tkinter or run numpy's import
+CORE = ("compact", "cache", "builders", "ruleset", "engine", "search")
+OTHERS = ("blind", "gamelog", "selfplay", "parallel", "server", "topocache", "simple_chess")
+
+PROBE = """
+import sys
+import {module}
+print(int("tkinter" in sys.modules), int("numpy" in sys.modules))
+"""
+
+# several threads build a board, the first numpy use of the process, at the same moment
+THREADED = """
+import sys
+import threading
+import engine
+
+barrier = threading.Barrier({threads})
+errors = []
+
+def build():
+    barrier.wait()
+
+    try:
+        engine.create_normal_board()
+    except Exception as error:
+        errors.append(repr(error))
+
+threads = [threading.Thread(target=build) for _ in range({threads})]
+
+for thread in threads:
+    thread.start()
+
+for thread in threads:
+    thread.join()
+
+print(len(errors), type(sys.modules["numpy"]).__name__, *errors[:1])
+"""
+
+
+def measure(module, runs=5):
+    # the cumulative import time in microseconds of the best of runs fresh interpreters, and what got loaded
+    best = None
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+                                capture_output=True, text=True, cwd=here, check=True)
+
+        for line in result.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+
+            if len(fields) == 3 and fields[2] == module:
+                cumulative = int(fields[1])
+
+        best = cumulative if best is None else min(best, cumulative)
+
+    tkinter, numpy = [bool(int(flag)) for flag in result.stdout.split()]
+
+    return best, tkinter, numpy
+
+
+def threaded_first_use(threads=8):
+    # the errors raised in the threads and the type sys.modules holds for numpy afterwards
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-c", THREADED.format(threads=threads)],
+                            capture_output=True, text=True, cwd=here, check=True)
+    errors, kind, *first = result.stdout.split(maxsplit=2)
+
+    return int(errors), kind, " ".join(first)
+
+
+def main(budget_ms=50):
+    failed = []
+
+    print(f"{'module':14} {'ms':>8} {'tkinter':>8} {'numpy':>6}")
+
+    for module in CORE + OTHERS:
+        micros, tkinter, numpy = measure(module)
+        print(f"{module:14} {micros / 1000:8.1f} {tkinter!s:>8} {numpy!s:>6}")
+
+        if module in CORE and (tkinter or numpy or micros > 1000 * budget_ms):
+            failed.append(module)
+
+    errors, kind, first = threaded_first_use()
+    print(f"threaded first use: {errors} errors, numpy registered as {kind}" + (f", {first}" if first else ""))
+
+    if errors or kind != "module":
+        failed.append("threaded first use")
+
+    if failed:
+        print(f"core modules over {budget_ms} ms or loading tkinter/numpy: {', '.join(failed)}")
+
+    return not failed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main(*[float(arg) for arg in sys.argv[1:2]]) else 1)
@@ -0,0 +1,59 @@
+import json
+import random
+import time
+
+from protocol import encode_frame, decode_frame
+
+
+def binary_decode(data):
+    # decode_frame only returns a view on the bytes, turning it into tuples makes it comparable to json_decode
+    fingerprint, records = decode_frame(data)
+
+    return fingerprint, [tuple(m) for m in records.tolist()]
+
+
+def json_encode(fingerprint, moves):
+    return json.dumps({"topology": fingerprint,
+                       "moves": [{"game": g, "from": a, "to": b, "promotion": p} for g, a, b, p in moves]}).encode()
+
+
+def json_decode(data):
+    frame = json.loads(data)
+
+    return frame["topology"], [(m["game"], m["from"], m["to"], m["promotion"]) for m in frame["moves"]]
+
+
+def bench(name, encode, decode, fingerprint, moves, repeat):
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        data = encode(fingerprint, moves)
+
+    encoded = time.perf_counter() - start
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        decode(data)
+
+    decoded = time.perf_counter() - start
+    n = len(moves) * repeat
+
+    print(f"{name:8} {len(data) / len(moves):6.1f} bytes/move  "
+          f"encode {n / encoded / 1e6:6.2f} Mmoves/s  decode {n / decoded / 1e6:6.2f} Mmoves/s")
+
+
+def main(n=10000, repeat=20):
+    rng = random.Random(0)
+    fingerprint = rng.getrandbits(64)
+    moves = [(rng.randrange(5000), rng.randrange(64), rng.randrange(64), 0) for _ in range(n)]
+
+    assert binary_decode(encode_frame(fingerprint, moves)) == (fingerprint, moves)
+    assert json_decode(json_encode(fingerprint, moves)) == (fingerprint, moves)
+
+    print(f"{n} moves per frame, {repeat} rounds")
+    bench("binary", encode_frame, binary_decode, fingerprint, moves, repeat)
+    bench("json", json_encode, json_decode, fingerprint, moves, repeat)
+
+
+if __name__ == "__main__":
+    main()
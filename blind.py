@@ -0,0 +1,76 @@
+HIDDEN = -1
+
+
+class BlindView:
+    # a player sees the tiles their pieces stand on or reach; seen[owner][tile] counts the pieces that see it,
+    # so a move only touches the reach of the pieces ChessState updates
+    def __init__(self, state):
+        self.state = state
+        self.seen = [{}, {}]
+        self.dirty = [set(), set()]
+
+        state.listeners.append(self)
+
+        if state.reach is not None:
+            self.reset()
+
+            for tile, reach in state.reach.items():
+                self.added(tile, tile.piece, reach)
+
+    def close(self):
+        self.state.listeners.remove(self)
+
+    def reset(self):
+        self.seen = [{}, {}]
+        self.dirty = [set(self.state.topo.tiles), set(self.state.topo.tiles)]
+
+    def added(self, tile, piece, reach):
+        seen, dirty = self.seen[piece.owner], self.dirty[piece.owner]
+
+        for target in (tile, *reach):
+            count = seen.get(target, 0)
+            seen[target] = count + 1
+
+            if not count:
+                dirty.add(target)
+
+    def removed(self, tile, piece, reach):
+        seen, dirty = self.seen[piece.owner], self.dirty[piece.owner]
+
+        for target in (tile, *reach):
+            count = seen[target] - 1
+
+            if count:
+                seen[target] = count
+            else:
+                del seen[target]
+                dirty.add(target)
+
+    def moved(self, a, b):
+        # the contents of a and b changed for whoever can see them, the others must not learn where the move was
+        for owner in (0, 1):
+            seen = self.seen[owner]
+            self.dirty[owner].update(tile for tile in (a, b) if tile in seen)
+
+    def visible(self, owner):
+        return self.seen[owner].keys()
+
+    def view(self, owner):
+        # every visible tile and its piece code
+        code, index = self.state.code, self.state.topo.index
+
+        return [(index[tile], code(tile)) for tile in self.seen[owner]]
+
+    def flush(self, owner):
+        # what changed for owner since the last flush, tiles that went out of sight are reported as HIDDEN
+        dirty, self.dirty[owner] = self.dirty[owner], set()
+        seen, code, index = self.seen[owner], self.state.code, self.state.topo.index
+
+        return [(index[tile], code(tile) if tile in seen else HIDDEN) for tile in dirty]
+
+    def board(self, owner):
+        # the full board as owner knows it, HIDDEN where they cannot see
+        seen, code = self.seen[owner], self.state.code
+
+        return [code(tile) if tile in seen else HIDDEN for tile in self.state.topo.tiles]
+
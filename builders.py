@@ -0,0 +1,77 @@
+import math
+
+from compact import compile_edges
+from lazy import lazy_import
+
+
+np = lazy_import("numpy")
+
+
+SQUARE = [(1, 0), (0, 1), (-1, 0), (0, -1), (1, 1), (-1, 1), (-1, -1), (1, -1)]
+
+# axial hex offsets, the tiles are stacked along (0, 1) so that pawns have a forward direction
+HEX = [(1, 0), (0, 1), (-1, 1), (-1, 0), (0, -1), (1, -1)]
+HEX_BASIS = (math.sqrt(3) / 2, 0.5), (0.0, 1.0)
+
+
+def grid_edges(xsize, ysize, offsets, basis=None, wrap_x=False, wrap_y=False):
+    # tile (x, y) gets id x * ysize + y, the same order as create_normal_board
+    if wrap_x and xsize < 3 or wrap_y and ysize < 3:
+        raise ValueError("a wrapped side needs at least 3 tiles")
+
+    x, y = np.meshgrid(np.arange(xsize), np.arange(ysize), indexing="ij")
+    x, y = x.ravel(), y.ravel()
+    basis = None if basis is None else np.asarray(basis, dtype=float)
+
+    src, dst, vectors, keeps = [], [], [], []
+
+    for dx, dy in offsets:
+        nx, ny = x + dx, y + dy
+        keep = np.ones(len(x), dtype=bool)
+
+        if wrap_x:
+            nx %= xsize
+        else:
+            keep &= (0 <= nx) & (nx < xsize)
+
+        if wrap_y:
+            ny %= ysize
+        else:
+            keep &= (0 <= ny) & (ny < ysize)
+
+        vec = np.array([dx, dy], dtype=float) if basis is None else dx * basis[0] + dy * basis[1]
+
+        dst.append(nx * ysize + ny)
+        vectors.append(vec)
+        keeps.append(keep)
+
+    # one row per tile and one column per offset, so that the kept edges come out sorted by tile
+    keep = np.stack(keeps, axis=1)
+    src = np.repeat(x * ysize + y, len(offsets)).reshape(keep.shape)
+    dst = np.stack(dst, axis=1)
+    vectors = np.broadcast_to(np.array(vectors), keep.shape + (2,))
+
+    return src[keep], dst[keep], vectors[keep]
+
+
+def grid_topology(xsize, ysize, offsets, basis=None, wrap_x=False, wrap_y=False):
+    src, dst, vectors = grid_edges(xsize, ysize, offsets, basis, wrap_x, wrap_y)
+    centre = (xsize // 2) * ysize + ysize // 2
+
+    return compile_edges(xsize * ysize, src, dst, vectors, [centre], [np.arange(xsize * ysize)])
+
+
+def rect_topology(xsize, ysize):
+    return grid_topology(xsize, ysize, SQUARE)
+
+
+def cylinder_topology(xsize, ysize):
+    return grid_topology(xsize, ysize, SQUARE, wrap_x=True)
+
+
+def torus_topology(xsize, ysize):
+    return grid_topology(xsize, ysize, SQUARE, wrap_x=True, wrap_y=True)
+
+
+def hex_topology(xsize, ysize, wrap_x=False, wrap_y=False):
+    return grid_topology(xsize, ysize, HEX, HEX_BASIS, wrap_x, wrap_y)
@@ -0,0 +1,80 @@
+import functools
+import threading
+from collections import OrderedDict
+
+from compact import SHAPES
+from lazy import lazy_import
+
+
+np = lazy_import("numpy")
+
+
+CODES = 1 + 2 * len(SHAPES)
+SEED = 0x5eed
+
+
+@functools.lru_cache(maxsize=8)
+def zobrist_keys(size):
+    # one random key per (tile, piece code), the same for every topology of the same size
+    rng = np.random.default_rng(SEED)
+    keys = rng.integers(0, 2 ** 64, size=(size + 1, CODES), dtype=np.uint64)
+    keys[:, 0] = 0
+
+    keys = keys.tolist()
+    turn_key = keys.pop()[1]
+
+    return keys, turn_key
+
+
+def position_hash(pieces, turn, keys, turn_key):
+    h = turn_key if turn else 0
+
+    for i, code in enumerate(pieces):
+        h ^= keys[i][code]
+
+    return h
+
+
+class MoveCache:
+    def __init__(self, maxsize=2 ** 16):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, compute):
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry
+
+            self.misses += 1
+
+        entry = compute()
+
+        with self.lock:
+            self.entries[key] = entry
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size": len(self.entries), "maxsize": self.maxsize}
+
+
+move_cache = MoveCache()
@@ -0,0 +1,394 @@
+import hashlib
+import math
+from collections import deque
+
+from lazy import lazy_import
+
+
+np = lazy_import("numpy")
+
+
+SHAPES = "KQRBkp"
+EMPTY = 0
+
+
+def piece_code(shape, owner):
+    return 1 + 2 * SHAPES.index(shape) + owner
+
+
+def code_shape(code):
+    return SHAPES[(code - 1) // 2]
+
+
+def code_owner(code):
+    return (code - 1) % 2
+
+
+def direction_classes(vectors):
+    vectors = np.asarray(vectors, dtype=float).reshape(-1, 2)
+
+    if not len(vectors):
+        return np.zeros((0, 2)), np.zeros(0, dtype=np.int64)
+
+    # unit vectors rounded to 6 decimals, packed into one integer each so that np.unique sorts a flat array
+    units = np.rint(vectors / np.linalg.norm(vectors, axis=1)[:, None] * 1e6).astype(np.int64)
+    keys, classes = np.unique((units[:, 0] + 2 ** 21) << 22 | (units[:, 1] + 2 ** 21), return_inverse=True)
+    directions = np.stack([(keys >> 22) - 2 ** 21, (keys & (2 ** 22 - 1)) - 2 ** 21], axis=1) / 1e6
+
+    return directions, classes.reshape(-1)
+
+
+def class_relations(directions, circle=2 * math.pi, epsilon=1e-5):
+    # which direction classes are opposite or perpendicular to each other, and which serve the rook, bishop and pawns
+    directions = np.asarray(directions, dtype=float).reshape(-1, 2)
+
+    def class_angles(ref):
+        ref = np.asarray(ref, dtype=float)
+        cos = directions @ ref.T / np.linalg.norm(ref, axis=-1)
+        return np.arccos(np.clip(cos, -1, 1)) / circle
+
+    def near(angles, circle_frac):
+        return np.abs(angles - circle_frac) < epsilon
+
+    relative = class_angles(directions)
+    opposite = near(relative, 0.5)
+    perpendicular = near(relative, 0.25)
+
+    horizontal = class_angles([1, 0])
+    orthogonal = near(horizontal, 0) | near(horizontal, 0.25) | near(horizontal, 0.5)
+    diagonal = near(horizontal, 1 / 8) | near(horizontal, 3 / 8)
+
+    vertical = class_angles([[0, 1], [0, -1]]).T
+    forward = near(vertical, 0)
+    capture = (epsilon < vertical) & (vertical < 0.25 - epsilon)
+
+    return opposite, perpendicular, orthogonal, diagonal, forward, capture
+
+
+# the constructor arguments of CompactTopology, every one of them a flat numpy array
+FIELDS = ("indptr", "indices", "dirs", "vectors", "directions", "straight_ptr", "straight", "turn_ptr", "turn",
+          "orthogonal", "diagonal", "forward", "capture", "chart_base", "chart_ptr", "chart_tiles")
+
+
+class CompactTopology:
+    # tiles are the integers 0..size-1, the edges of tile i are indptr[i]:indptr[i + 1]
+    def __init__(self, indptr, indices, dirs, vectors, directions,
+                 straight_ptr, straight, turn_ptr, turn,
+                 orthogonal, diagonal, forward, capture,
+                 chart_base, chart_ptr, chart_tiles, fingerprint=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.dirs = dirs
+        self.vectors = vectors
+        self.directions = directions
+
+        self.straight_ptr = straight_ptr
+        self.straight = straight
+        self.turn_ptr = turn_ptr
+        self.turn = turn
+
+        self.orthogonal = orthogonal
+        self.diagonal = diagonal
+        self.forward = forward
+        self.capture = capture
+
+        self.chart_base = chart_base
+        self.chart_ptr = chart_ptr
+        self.chart_tiles = chart_tiles
+
+        self.size = len(indptr) - 1
+
+        # a fingerprint stored alongside the arrays saves hashing them again on load
+        if fingerprint is None:
+            digest = hashlib.blake2b(digest_size=8)
+
+            for a in (indptr, indices, dirs, directions, orthogonal, diagonal, forward, capture):
+                digest.update(np.ascontiguousarray(a).tobytes())
+
+            fingerprint = int.from_bytes(digest.digest(), "little")
+
+        self.fingerprint = fingerprint
+
+    def edges(self, i):
+        return range(self.indptr[i], self.indptr[i + 1])
+
+    def straight_edges(self, e):
+        return self.straight[self.straight_ptr[e]:self.straight_ptr[e + 1]]
+
+    def turn_edges(self, e):
+        return self.turn[self.turn_ptr[e]:self.turn_ptr[e + 1]]
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def nbytes(self):
+        return sum(a.nbytes for a in vars(self).values() if isinstance(a, np.ndarray))
+
+
+def class_mask(classes, n):
+    mask = np.zeros(n, dtype=bool)
+    mask[list(classes)] = True
+    return mask
+
+
+def csr(rows, dtype="int32"):
+    ptr = np.zeros(len(rows) + 1, dtype=np.int32)
+    ptr[1:] = np.cumsum([len(row) for row in rows])
+
+    return ptr, np.fromiter((x for row in rows for x in row), dtype=dtype, count=ptr[-1])
+
+
+def compact_topology(topo):
+    index = topo.index
+    n = len(topo.directions)
+
+    rows = []
+    edge_id = {}
+    edges = []
+
+    for tile in topo.tiles:
+        row = []
+
+        for neigh in topo.edge_class[tile]:
+            edge_id[tile, neigh] = len(edges)
+            edges.append((tile, neigh))
+            row.append(index[neigh])
+
+        rows.append(row)
+
+    indptr, indices = csr(rows)
+    dirs = np.array([topo.edge_class[a][b] for a, b in edges], dtype=np.int16)
+    vectors = np.array([a.neighs[b][:2] for a, b in edges], dtype=np.float32).reshape(-1, 2)
+
+    straight_ptr, straight = csr([[edge_id[b, c] for c in topo.straight[a][b]] for a, b in edges])
+    turn_ptr, turn = csr([[edge_id[b, c] for c in topo.turns[a][b]] for a, b in edges])
+
+    chart_ptr, chart_tiles = csr([[index[tile] for tile in chart.tiles] for chart in topo.atlas])
+    chart_base = np.array([index[chart.base] for chart in topo.atlas], dtype=np.int32)
+
+    return CompactTopology(indptr, indices, dirs, vectors, np.asarray(topo.directions, dtype=np.float32),
+                           straight_ptr, straight, turn_ptr, turn,
+                           class_mask(topo.orthogonal, n), class_mask(topo.diagonal, n),
+                           np.stack([class_mask(c, n) for c in topo.forward]),
+                           np.stack([class_mask(c, n) for c in topo.capture]),
+                           chart_base, chart_ptr, chart_tiles)
+
+
+def group_by_class(classes, n):
+    order = np.argsort(classes.astype(np.int16), kind="stable")
+    bounds = np.zeros(n + 1, dtype=np.int64)
+    bounds[1:] = np.cumsum(np.bincount(classes, minlength=n))
+
+    return [order[bounds[c]:bounds[c + 1]] for c in range(n)]
+
+
+def successor_edges(out, dst, groups, relation):
+    # for every edge e = u -> v, the edges leaving v whose class stands in relation to the class of v -> u
+    pairs = []
+
+    for a, b in zip(*np.nonzero(relation)):
+        sel = groups[a]
+        succ = out[dst[sel], b]
+        keep = succ >= 0
+        pairs.append((sel[keep], succ[keep]))
+
+    edges = np.concatenate([p[0] for p in pairs] + [np.zeros(0, dtype=np.int64)])
+    succ = np.concatenate([p[1] for p in pairs] + [np.zeros(0, dtype=np.int64)])
+
+    order = np.argsort(edges, kind="stable")
+    ptr = np.zeros(len(dst) + 1, dtype=np.int32)
+    ptr[1:] = np.cumsum(np.bincount(edges, minlength=len(dst)))
+
+    return ptr, succ[order].astype(np.int32)
+
+
+def reverse_edges(size, src, dst, out, groups, opposite):
+    reverse = np.full(len(src), -1, dtype=np.int64)
+
+    # on regular boards the reverse edge points the opposite way, try that first
+    for a, b in zip(*np.nonzero(opposite)):
+        sel = groups[a]
+        cand = out[dst[sel], b]
+        hit = (cand >= 0) & (dst[np.maximum(cand, 0)] == src[sel])
+        reverse[sel[hit]] = cand[hit]
+
+    missing = np.flatnonzero(reverse < 0)
+
+    if len(missing):
+        keys = src * size + dst
+        key_order = np.argsort(keys)
+        wanted = dst[missing] * size + src[missing]
+        found = key_order[np.minimum(np.searchsorted(keys, wanted, sorter=key_order), len(keys) - 1)]
+
+        if not np.array_equal(keys[found], wanted):
+            raise ValueError("every edge needs a reverse edge")
+
+        reverse[missing] = found
+
+    return reverse
+
+
+def compile_edges(size, src, dst, vectors, chart_base=None, chart_tiles=None):
+    # vectorised counterpart of Topology.compile + compact_topology for boards given as edge arrays,
+    # every tile may have at most one neighbour per direction class
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, 2)
+
+    order = np.argsort(src, kind="stable")
+    src, dst, vectors = src[order], dst[order], vectors[order]
+
+    directions, dirs = direction_classes(vectors)
+    opposite, perpendicular, orthogonal, diagonal, forward, capture = class_relations(directions)
+
+    out = np.full((size, len(directions)), -1, dtype=np.int64)
+    out[src, dirs] = np.arange(len(src))
+
+    if np.count_nonzero(out >= 0) != len(src):
+        raise ValueError("a tile has more than one neighbour in the same direction class")
+
+    groups = group_by_class(dirs, len(directions))
+    back = dirs[reverse_edges(size, src, dst, out, groups, opposite)]
+    back_groups = group_by_class(back, len(directions))
+
+    straight_ptr, straight = successor_edges(out, dst, back_groups, opposite)
+    turn_ptr, turn = successor_edges(out, dst, back_groups, perpendicular)
+
+    indptr = np.zeros(size + 1, dtype=np.int32)
+    indptr[1:] = np.cumsum(np.bincount(src, minlength=size))
+
+    if chart_base is None:
+        chart_base, chart_tiles = [size // 2], [np.arange(size)]
+
+    chart_ptr = np.zeros(len(chart_tiles) + 1, dtype=np.int32)
+    chart_ptr[1:] = np.cumsum([len(tiles) for tiles in chart_tiles])
+
+    return CompactTopology(indptr, dst.astype(np.int32), dirs.astype(np.int16), vectors,
+                           directions.astype(np.float32),
+                           straight_ptr, straight, turn_ptr, turn,
+                           orthogonal, diagonal, forward, capture,
+                           np.asarray(chart_base, dtype=np.int32), chart_ptr,
+                           np.concatenate(chart_tiles).astype(np.int32))
+
+
+class CompactBoard:
+    def __init__(self, topo, pieces=None, turn=0):
+        self.topo = topo
+        self.pieces = np.zeros(topo.size, dtype=np.int8) if pieces is None else pieces
+        self.turn = turn
+
+    def copy(self):
+        return CompactBoard(self.topo, self.pieces.copy(), self.turn)
+
+
+class CompactChessState:
+    def __init__(self, board):
+        self.board = board
+
+    def get_moves(self, a):
+        return compact_move_iter(self.board, a)
+
+    def move(self, a, b):
+        board = self.board
+        code = board.pieces[a]
+
+        if not code:
+            return
+
+        if code_owner(code) != board.turn:
+            return
+
+        if b in self.get_moves(a):
+            board.pieces[a] = EMPTY
+            board.pieces[b] = code
+
+            board.turn = 1 - board.turn
+
+
+def compact_move_iter(board, i):
+    code = board.pieces[i]
+
+    return compact_move_iters[code_shape(code)](board, i, code_owner(code))
+
+
+def compact_king_iter(board, i, owner):
+    topo = board.topo
+
+    yield from topo.indices[topo.indptr[i]:topo.indptr[i + 1]]
+
+
+def compact_slide_iter(board, i, mask):
+    topo = board.topo
+    q = deque()
+    visited = set()
+    reached = {i}
+
+    for e in topo.edges(i):
+        if mask is None or mask[topo.dirs[e]]:
+            q.append(e)
+
+    while q:
+        e = q.popleft()
+        tile = topo.indices[e]
+        state = tile, topo.dirs[e]
+
+        if state in visited:
+            continue
+
+        visited.add(state)
+
+        if tile not in reached:
+            reached.add(tile)
+            yield tile
+
+        if board.pieces[tile] or tile == i:
+            continue
+
+        for f in topo.straight_edges(e):
+            if mask is None or mask[topo.dirs[f]]:
+                q.append(f)
+
+
+def compact_queen_iter(board, i, owner):
+    return compact_slide_iter(board, i, None)
+
+
+def compact_rook_iter(board, i, owner):
+    return compact_slide_iter(board, i, board.topo.orthogonal)
+
+
+def compact_bishop_iter(board, i, owner):
+    return compact_slide_iter(board, i, board.topo.diagonal)
+
+
+def compact_knight_iter(board, i, owner):
+    topo = board.topo
+
+    for e in topo.edges(i):
+        for f in topo.straight_edges(e):
+            yield from topo.indices[topo.turn_edges(f)]
+
+
+def compact_pawn_iter(board, i, owner):
+    topo = board.topo
+    forward = topo.forward[owner]
+    capture = topo.capture[owner]
+
+    for e in topo.edges(i):
+        c = topo.dirs[e]
+        neigh = topo.indices[e]
+
+        if forward[c] and not board.pieces[neigh]:
+            yield neigh
+        elif capture[c] and board.pieces[neigh]:
+            yield neigh
+
+
+compact_move_iters = {
+    "K": compact_king_iter,
+    "Q": compact_queen_iter,
+    "R": compact_rook_iter,
+    "B": compact_bishop_iter,
+    "k": compact_knight_iter,
+    "p": compact_pawn_iter,
+}
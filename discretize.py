@@ -0,0 +1,230 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from builders import SQUARE
+from compact import compile_edges
+
+
+class Torus:
+    domain = (0, 2 * np.pi), (0, 2 * np.pi)
+    wrap_u = wrap_v = True
+    poles = False
+
+    def __init__(self, R=2.0, r=1.0):
+        self.R = R
+        self.r = r
+
+    def __call__(self, u, v):
+        w = self.R + self.r * np.cos(v)
+        return np.stack([w * np.cos(u), w * np.sin(u), self.r * np.sin(v)], axis=-1)
+
+
+class Sphere:
+    domain = (0, 2 * np.pi), (0, np.pi)
+    wrap_u = True
+    wrap_v = False
+    poles = True
+
+    def __init__(self, r=1.0):
+        self.r = r
+
+    def __call__(self, u, v):
+        return self.r * np.stack([np.sin(v) * np.cos(u), np.sin(v) * np.sin(u), np.cos(v)], axis=-1)
+
+
+def sample(surface, u, v, du, dv):
+    # positions and the local tangent frame, from central differences so that every tile is independent
+    h = 1e-6
+    p = surface(u, v)
+    e_u = (surface(u + h, v) - surface(u - h, v)) / (2 * h)
+    e_v = (surface(u, v + h) - surface(u, v - h)) / (2 * h)
+
+    len_u = np.linalg.norm(e_u, axis=-1)
+    e1 = e_u / len_u[..., None]
+
+    # how far a step along v leans along u, in units of a step along u; zero for orthogonal parametrisations
+    shear = dv * np.einsum("...i,...i", e_v, e1) / (du * len_u)
+    shear[np.abs(shear) < 1e-6] = 0
+
+    return p, shear
+
+
+def sample_grid(surface, nu, nv, workers=None):
+    (u0, u1), (v0, v1) = surface.domain
+    du, dv = (u1 - u0) / nu, (v1 - v0) / nv
+
+    # cell centres, so that open ends (the sphere's poles) are never sampled
+    u = u0 + du * (np.arange(nu) + 0.5)
+    v = v0 + dv * (np.arange(nv) + 0.5)
+    u, v = [a.ravel() for a in np.meshgrid(u, v, indexing="ij")]
+
+    if not workers:
+        return sample(surface, u, v, du, dv)
+
+    chunks = np.array_split(np.arange(len(u)), workers)
+
+    with ProcessPoolExecutor(workers) as pool:
+        results = list(pool.map(sample, [surface] * workers, [u[c] for c in chunks], [v[c] for c in chunks],
+                                [du] * workers, [dv] * workers))
+
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def lattice_edges(nu, nv, shear, wrap_u, wrap_v):
+    # tile (i, j) has id i * nv + j; vectors are tangent-space steps measured in local grid steps
+    i, j = [a.ravel() for a in np.meshgrid(np.arange(nu), np.arange(nv), indexing="ij")]
+    src, dst, vectors = [], [], []
+
+    for di, dj in SQUARE:
+        ni, nj = i + di, j + dj
+        keep = np.ones(len(i), dtype=bool)
+
+        if wrap_u:
+            ni %= nu
+        else:
+            keep &= (0 <= ni) & (ni < nu)
+
+        if wrap_v:
+            nj %= nv
+        else:
+            keep &= (0 <= nj) & (nj < nv)
+
+        a, b = i[keep] * nv + j[keep], ni[keep] * nv + nj[keep]
+
+        src.append(a)
+        dst.append(b)
+        vectors.append(np.stack([di + dj * shear[a], np.full(len(a), dj, dtype=float)], axis=1))
+
+    return np.concatenate(src), np.concatenate(dst), np.concatenate(vectors)
+
+
+def block_charts(nu, nv, chart_size, exists=None, offset=0):
+    bases, tiles = [], []
+
+    for i0 in range(0, nu, chart_size):
+        for j0 in range(0, nv, chart_size):
+            i, j = np.meshgrid(np.arange(i0, min(i0 + chart_size, nu)), np.arange(j0, min(j0 + chart_size, nv)),
+                               indexing="ij")
+            ids = (i * nv + j).ravel()
+
+            if exists is not None:
+                ids = ids[exists[ids]]
+
+            if not len(ids):
+                continue
+
+            centre = min(i0 + chart_size // 2, nu - 1) * nv + min(j0 + chart_size // 2, nv - 1)
+            base = centre if exists is None or exists[centre] else ids[0]
+
+            bases.append(base + offset)
+            tiles.append(ids + offset)
+
+    return bases, tiles
+
+
+def discretize(surface, nu, nv, chart_size=None, workers=None):
+    # samples the surface on an nu x nv grid of its parameter domain, returns the compiled topology
+    # and the 3d position of every tile
+    positions, shear = sample_grid(surface, nu, nv, workers)
+    src, dst, vectors = lattice_edges(nu, nv, shear, surface.wrap_u, surface.wrap_v)
+    size = nu * nv
+
+    bases, tiles = block_charts(nu, nv, chart_size or max(nu, nv))
+
+    if surface.poles:
+        # one tile per pole, joined to every tile of the nearest ring; the pole sees them around its own circle
+        angles = 2 * np.pi * (np.arange(nu) + 0.5) / nu
+        around = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+
+        for pole, ring, step in [(size, np.arange(nu) * nv, -1.0), (size + 1, np.arange(nu) * nv + nv - 1, 1.0)]:
+            src = np.concatenate([src, ring, np.full(nu, pole)])
+            dst = np.concatenate([dst, np.full(nu, pole), ring])
+            vectors = np.concatenate([vectors, np.tile([0.0, step], (nu, 1)), around])
+
+            bases.append(pole)
+            tiles.append(np.concatenate([[pole], ring]))
+
+        (u0, _), (v0, v1) = surface.domain
+        positions = np.concatenate([positions, surface(np.array([u0, u0]), np.array([v0, v1]))])
+        size += 2
+
+    return compile_edges(size, src, dst, vectors, bases, tiles), positions
+
+
+def genus_surface(genus, nu, nv, hole=None, chart_size=None, workers=None, surface=None):
+    # connected sum of genus tori: torus k and k + 1 are glued along a square hole cut out of each,
+    # a step into the hole comes out of the matching hole of the other torus
+    surface = surface or Torus()
+    hole = hole or max(1, min(nu, nv) // 4)
+
+    if genus < 1 or min(nu, nv) < 2 * hole + 4:
+        raise ValueError("need genus >= 1 and room for two holes on every torus")
+
+    positions, shear = sample_grid(surface, nu, nv, workers)
+    src, dst, vectors = lattice_edges(nu, nv, shear, True, True)
+    per = nu * nv
+
+    holes = [(1, 1), (nu // 2 + 1, nv // 2 + 1)]
+
+    def in_range(a, lo):
+        return (lo <= a) & (a < lo + hole)
+
+    si, sj = src // nv, src % nv
+    di, dj = dst // nv, dst % nv
+    ti, tj = np.arange(per) // nv, np.arange(per) % nv
+
+    all_src, all_dst, all_vectors, exists = [], [], [], []
+
+    for k in range(genus):
+        glued = [(holes[0], holes[1], k - 1)] if k > 0 else []
+        glued += [(holes[1], holes[0], k + 1)] if k < genus - 1 else []
+
+        out = np.zeros(per, dtype=bool)
+
+        for corner, _, _ in glued:
+            out |= in_range(ti, corner[0]) & in_range(tj, corner[1])
+
+        keep = ~out[src] & ~out[dst]
+        all_src.append(src[keep] + k * per)
+        all_dst.append(dst[keep] + k * per)
+        all_vectors.append(vectors[keep])
+
+        for corner, twin, other in glued:
+            # drop the components of the step that cross into the hole, and land on the twin of that tile
+            into = ~out[src] & in_range(di, corner[0]) & in_range(dj, corner[1])
+            li = np.where(in_range(si, corner[0]), di, si)[into]
+            lj = np.where(in_range(sj, corner[1]), dj, sj)[into]
+
+            all_src.append(src[into] + k * per)
+            all_dst.append((li - corner[0] + twin[0]) * nv + lj - corner[1] + twin[1] + other * per)
+            all_vectors.append(vectors[into])
+
+        exists.append(~out)
+
+    exists = np.concatenate(exists)
+    src = np.concatenate(all_src)
+    dst = np.concatenate(all_dst)
+    vectors = np.concatenate(all_vectors)
+
+    # renumber the tiles that survived the holes
+    ids = np.cumsum(exists) - 1
+    bases, tiles = [], []
+
+    for k in range(genus):
+        b, t = block_charts(nu, nv, chart_size or max(nu, nv), exists[k * per:(k + 1) * per], k * per)
+        bases += [ids[base] for base in b]
+        tiles += [ids[tile] for tile in t]
+
+    shift = 2.5 * (getattr(surface, "R", 1.0) + getattr(surface, "r", 1.0))
+    positions = np.concatenate([positions + [k * shift, 0, 0] for k in range(genus)])[exists]
+
+    return compile_edges(int(exists.sum()), ids[src], ids[dst], vectors, bases, tiles), positions
+
+
+def torus_board(nu, nv, **kwargs):
+    return discretize(Torus(), nu, nv, **kwargs)
+
+
+def sphere_board(nu, nv, **kwargs):
+    return discretize(Sphere(), nu, nv, **kwargs)
@@ -0,0 +1,545 @@
+import itertools as itr
+from collections import deque
+
+from builders import rect_topology
+from cache import move_cache, zobrist_keys
+from compact import CompactBoard, compact_topology, direction_classes, class_relations, piece_code, code_shape, \
+    code_owner
+from lazy import lazy_import
+from ruleset import Ruleset, register, MOVES, LEGAL, MOVED
+
+
+np = lazy_import("numpy")
+
+
+class HeadlessChess:
+    def __init__(self):
+        self.topo = None
+        self.turn = 0
+        self.chess_state = None
+        self.observers = []
+
+    def set_topo(self, topo):
+        self.topo = topo
+
+    def load_chess_state(self, state):
+        state.topo = self.topo
+        self.chess_state = state
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def select(self, tile):
+        for observer in self.observers:
+            observer.selected(tile)
+
+    def deselect(self, tile):
+        for observer in self.observers:
+            observer.deselected(tile)
+
+    def move(self, a, b):
+        moved = self.chess_state.move(a, b)
+
+        if moved:
+            for observer in self.observers:
+                observer.moved(a, b)
+
+        return moved
+
+    def report(self):
+        state = self.chess_state
+        index = self.topo.index
+
+        return {
+            "turn": self.turn,
+            "winner": state.winner,
+            "check": [state.in_check(0), state.in_check(1)],
+            "pieces": {index[t]: (t.piece.shape, t.piece.owner) for t in self.topo.tiles if t.piece},
+        }
+
+
+class Topology:
+    def __init__(self, tiles, atlas):
+        self.tiles = tiles
+        self.atlas = atlas
+        self.circle = 2 * np.pi
+        self.epsilon = 1e-5
+
+        self.directions = None
+        self.edge_class = None
+        self.straight = None
+        self.turns = None
+        self.orthogonal = None
+        self.diagonal = None
+        self.forward = None
+        self.capture = None
+        self.index = None
+        self.compacted = None
+        self.version = 0
+        self.chart_index = None
+
+        self.compile()
+
+    def get_charts(self, tile):
+        return self.chart_index.get(tile, ())
+
+    def index_charts(self):
+        self.chart_index = {tile: [] for tile in self.tiles}
+
+        for chart in self.atlas:
+            for tile in chart.tiles:
+                self.chart_index[tile].append(chart)
+
+    def add_chart(self, chart):
+        self.atlas.append(chart)
+        self.compacted = None
+
+        for tile in chart.tiles:
+            self.chart_index.setdefault(tile, []).append(chart)
+
+    def remove_chart(self, chart):
+        self.atlas.remove(chart)
+        self.compacted = None
+
+        for tile in chart.tiles:
+            self.chart_index[tile].remove(chart)
+
+    def angle(self, a, b):
+        return np.arccos(np.dot(a, b) / np.linalg.norm(a) / np.linalg.norm(b))
+
+    def is_angle(self, a, b, circle_frac):
+        return abs(self.angle(a, b) / self.circle - circle_frac) < self.epsilon
+
+    def compact(self):
+        if self.compacted is None:
+            self.compacted = compact_topology(self)
+
+        return self.compacted
+
+    def compile(self):
+        self.index = {tile: i for i, tile in enumerate(self.tiles)}
+        self.compacted = None
+        self.version += 1
+        self.index_charts()
+
+        # label every edge with a direction class, so that the move iterators only compare integers
+        edges = [(tile, neigh, vec) for tile in self.tiles for neigh, vec in tile.neighs.items()]
+
+        self.directions, classes = direction_classes([vec[:2] for _, _, vec in edges])
+        opposite, perpendicular, orthogonal, diagonal, forward, capture = \
+            class_relations(self.directions, self.circle, self.epsilon)
+
+        opposite = [frozenset(np.flatnonzero(row)) for row in opposite]
+        perpendicular = [frozenset(np.flatnonzero(row)) for row in perpendicular]
+
+        self.orthogonal = frozenset(np.flatnonzero(orthogonal))
+        self.diagonal = frozenset(np.flatnonzero(diagonal))
+        self.forward = [frozenset(np.flatnonzero(mask)) for mask in forward]
+        self.capture = [frozenset(np.flatnonzero(mask)) for mask in capture]
+
+        self.edge_class = {tile: {} for tile in self.tiles}
+
+        for (tile, neigh, _), c in zip(edges, classes):
+            self.edge_class[tile][neigh] = int(c)
+
+        # successors of the edge tile -> neigh, continuing straight on or turning by a quarter circle
+        self.straight = {tile: {} for tile in self.tiles}
+        self.turns = {tile: {} for tile in self.tiles}
+
+        for tile, neigh, _ in edges:
+            out = self.edge_class[neigh]
+            c_in = out[tile]
+
+            self.straight[tile][neigh] = tuple(n for n, c in out.items() if c in opposite[c_in])
+            self.turns[tile][neigh] = tuple(n for n, c in out.items() if c in perpendicular[c_in])
+
+
+class Chart:
+    def __init__(self, base, tiles):
+        self.base = base
+        self.tiles = tiles
+
+
+class Tile:
+    def __init__(self):
+        self.piece = None
+        self.neighs = {}
+
+    def add_neigh(self, neigh, vector):
+        self.neighs[neigh] = vector
+        neigh.neighs[self] = -vector
+
+
+class ChessState:
+    def __init__(self, game, rules=None):
+        self.topo = None
+        self.game = game
+        self.rules = rules or normal_rules
+        self.checked = None
+
+        # told about every piece added to or removed from the reach maps, and about every move
+        self.listeners = []
+
+        # reach[tile] holds the targets of the piece on tile, attacked_by[tile] the tiles whose piece can reach it;
+        # both ignore the legal rules, which depend on the target and are applied when a move is listed or played
+        self.reach = None
+        self.attacked_by = None
+
+        # kings[owner] holds the tiles of owner's pieces whose shape a rule declares royal, as last_king does for K
+        self.kings = None
+        self.winner = None
+
+        # zobrist hash of the position, keying the move lists shared through the cache
+        self.cache = move_cache
+        self.hash = None
+        self.keys = None
+        self.turn_key = None
+        self.fingerprint = None
+
+    def get_moves(self, a, piece):
+        if self.hash is None:
+            self.setup()
+
+        topo = self.topo
+
+        def generate():
+            return tuple(topo.index[t] for t in self.rules.moves[piece.shape](piece, topo, a))
+
+        moves = self.cache.get((self.fingerprint, self.rules.key, self.hash, topo.index[a]), generate)
+
+        return [topo.tiles[i] for i in moves]
+
+    def code(self, tile):
+        return piece_code(tile.piece.shape, tile.piece.owner) if tile.piece else 0
+
+    def setup(self):
+        tiles = self.topo.tiles
+
+        if self.checked is not self.topo:
+            self.rules.check({"Topology": self.topo, "Tile": tiles[0], "Piece": Piece("K", 0), "ChessState": self,
+                              "Game": self.game})
+            self.checked = self.topo
+
+        self.keys, self.turn_key = zobrist_keys(len(tiles))
+        self.fingerprint = self.topo.compact().fingerprint
+        self.hash = self.turn_key if self.game.turn else 0
+
+        for i, tile in enumerate(tiles):
+            self.hash ^= self.keys[i][self.code(tile)]
+
+        self.reach = {}
+        self.attacked_by = {tile: set() for tile in self.topo.tiles}
+        self.kings = [set(), set()]
+
+        for listener in self.listeners:
+            listener.reset()
+
+        for tile in self.topo.tiles:
+            if tile.piece:
+                self.add_piece(tile)
+
+    def add_piece(self, tile):
+        piece = tile.piece
+        reach = self.reach[tile] = set(self.get_moves(tile, piece))
+
+        for target in reach:
+            self.attacked_by[target].add(tile)
+
+        if self.rules.royal[piece.shape]:
+            self.kings[piece.owner].add(tile)
+
+        for listener in self.listeners:
+            listener.added(tile, piece, reach)
+
+    def remove_piece(self, tile):
+        reach = self.reach.pop(tile)
+
+        for target in reach:
+            self.attacked_by[target].discard(tile)
+
+        if self.rules.royal[tile.piece.shape]:
+            self.kings[tile.piece.owner].discard(tile)
+
+        for listener in self.listeners:
+            listener.removed(tile, tile.piece, reach)
+
+    def is_legal(self, a, b):
+        if self.reach is None:
+            self.setup()
+
+        piece = a.piece
+
+        return bool(piece) and piece.owner == self.game.turn and b in self.reach[a] and self.allowed(a, b)
+
+    def allowed(self, a, b):
+        piece = a.piece
+
+        return all(legal(piece, self.topo, a, b) for legal in self.rules.legal[piece.shape])
+
+    def targets(self, a):
+        # the moves of the piece on a that the legal rules allow
+        reach = self.reach[a]
+
+        if not self.rules.legal[a.piece.shape]:
+            return reach
+
+        return [b for b in reach if self.allowed(a, b)]
+
+    def in_check(self, owner):
+        if self.reach is None:
+            self.setup()
+
+        return any(t.piece.owner != owner for king in self.kings[owner] for t in self.attacked_by[king])
+
+    def restore_piece(self, tile, reach):
+        # re-adds a piece with the reach it had before, without generating its moves again
+        self.reach[tile] = reach
+
+        for target in reach:
+            self.attacked_by[target].add(tile)
+
+        if self.rules.royal[tile.piece.shape]:
+            self.kings[tile.piece.owner].add(tile)
+
+        for listener in self.listeners:
+            listener.added(tile, tile.piece, reach)
+
+    def make_move(self, a, b):
+        # plays a legal move and returns the record unmake_move needs to take it back, None otherwise
+        if self.winner is not None or not self.is_legal(a, b):
+            return None
+
+        piece, captured = a.piece, b.piece
+
+        # only the pieces whose rays pass through a or b, and the pawns next to them, can change their moves
+        affected = self.attacked_by[a] | self.attacked_by[b]
+
+        for tile in itr.chain(a.neighs, b.neighs):
+            if tile.piece:
+                affected.add(tile)
+
+        affected -= {a, b}
+
+        # the old reach sets are replaced rather than mutated, so keeping references is enough to undo
+        reaches = {tile: self.reach[tile] for tile in affected}
+        reaches[a] = self.reach[a]
+
+        if captured:
+            reaches[b] = self.reach[b]
+
+        undo = a, b, piece, captured, reaches, self.hash, self.winner, self.game.turn
+
+        ia, ib = self.topo.index[a], self.topo.index[b]
+        self.hash ^= self.keys[ia][self.code(a)] ^ self.keys[ib][self.code(b)] ^ self.turn_key
+        self.hash ^= self.keys[ib][self.code(a)]
+
+        self.remove_piece(a)
+
+        if captured:
+            self.remove_piece(b)
+
+        a.piece = None
+        b.piece = piece
+
+        self.add_piece(b)
+
+        for tile in affected:
+            self.remove_piece(tile)
+            self.add_piece(tile)
+
+        for effect in self.rules.moved[piece.shape]:
+            effect(self, piece, captured)
+
+        self.game.turn = 1 - self.game.turn
+
+        for listener in self.listeners:
+            listener.moved(a, b)
+
+        return undo
+
+    def unmake_move(self, undo):
+        a, b, piece, captured, reaches, self.hash, self.winner, self.game.turn = undo
+
+        self.remove_piece(b)
+
+        for tile in reaches:
+            if tile is not a and tile is not b:
+                self.remove_piece(tile)
+
+        a.piece = piece
+        b.piece = captured
+
+        for tile, reach in reaches.items():
+            self.restore_piece(tile, reach)
+
+        for listener in self.listeners:
+            listener.moved(b, a)
+
+    def move(self, a, b):
+        return self.make_move(a, b) is not None
+
+    def to_compact(self):
+        pieces = np.array([self.code(t) for t in self.topo.tiles], dtype=np.int8)
+
+        return CompactBoard(self.topo.compact(), pieces, self.game.turn)
+
+    def load_compact(self, board):
+        for tile, code in zip(self.topo.tiles, board.pieces):
+            tile.piece = Piece(code_shape(code), int(code_owner(code))) if code else None
+
+        self.game.turn = int(board.turn)
+        self.reach = None
+        self.hash = None
+        self.winner = None
+
+
+def piece_move_iter(piece, topo, tile, rules=None):
+    return (rules or normal_rules).targets[piece.shape](piece, topo, tile)
+
+
+class Piece:
+    def __init__(self, shape, owner):
+        self.shape = shape
+        self.owner = owner
+
+
+@register("king", MOVES, "K", fields=("Tile.neighs",))
+def king_move_iter(piece, topo, tile):
+    yield from tile.neighs
+
+
+def slide_move_iter(topo, start, classes):
+    q = deque()
+    visited = set()
+    reached = {start}
+
+    for neigh, c in topo.edge_class[start].items():
+        if classes is None or c in classes:
+            q.append((start, neigh))
+
+    while q:
+        prev, tile = q.popleft()
+        state = tile, topo.edge_class[prev][tile]
+
+        if state in visited:
+            continue
+
+        visited.add(state)
+
+        if tile not in reached:
+            reached.add(tile)
+            yield tile
+
+        if tile.piece or tile is start:
+            continue
+
+        for neigh in topo.straight[prev][tile]:
+            if classes is None or topo.edge_class[tile][neigh] in classes:
+                q.append((tile, neigh))
+
+
+@register("queen", MOVES, "Q", fields=("Topology.edge_class", "Topology.straight", "Tile.piece"))
+def queen_move_iter(piece, topo, tile):
+    return slide_move_iter(topo, tile, None)
+
+
+@register("rook", MOVES, "R", fields=("Topology.edge_class", "Topology.straight", "Topology.orthogonal",
+                                    "Tile.piece"))
+def rook_move_iter(piece, topo, tile):
+    return slide_move_iter(topo, tile, topo.orthogonal)
+
+
+@register("bishop", MOVES, "B", fields=("Topology.edge_class", "Topology.straight", "Topology.diagonal",
+                                        "Tile.piece"))
+def bishop_move_iter(piece, topo, tile):
+    return slide_move_iter(topo, tile, topo.diagonal)
+
+
+@register("knight", MOVES, "k", fields=("Tile.neighs", "Topology.straight", "Topology.turns"))
+def knight_move_iter(piece, topo, tile):
+    for step1 in tile.neighs:
+        for step2 in topo.straight[tile][step1]:
+            yield from topo.turns[step1][step2]
+
+
+@register("pawn", MOVES, "p", fields=("Topology.edge_class", "Topology.forward", "Topology.capture",
+                                    "Tile.piece", "Piece.owner"))
+def pawn_move_iter(piece, topo, tile):
+    forward = topo.forward[piece.owner]
+    capture = topo.capture[piece.owner]
+
+    for neigh, c in topo.edge_class[tile].items():
+        if c in forward and not neigh.piece:
+            yield neigh
+        elif c in capture and neigh.piece:
+            yield neigh
+
+
+@register("no_self_capture", LEGAL, fields=("Tile.piece", "Piece.owner"))
+def no_self_capture(piece, topo, tile, target):
+    return not target.piece or target.piece.owner != piece.owner
+
+
+@register("last_king", MOVED, requires=("king",), fields=("ChessState.kings", "ChessState.winner"), royal=("K",))
+def last_king(state, piece, captured):
+    # a side without kings has lost, including when it took its own last king
+    if not state.kings[1 - piece.owner]:
+        state.winner = piece.owner
+    elif not state.kings[piece.owner]:
+        state.winner = 1 - piece.owner
+
+
+NORMAL_RULES = "king", "queen", "rook", "bishop", "knight", "pawn", "last_king"
+normal_rules = Ruleset(NORMAL_RULES)
+
+
+def topology_from_compact(compact):
+    tiles = np.empty(compact.size, dtype=object)
+
+    for i in range(compact.size):
+        tiles[i] = Tile()
+
+    for i in range(compact.size):
+        for e in compact.edges(i):
+            tiles[i].neighs[tiles[compact.indices[e]]] = compact.vectors[e]
+
+    atlas = []
+
+    for k, base in enumerate(compact.chart_base):
+        chart_tiles = compact.chart_tiles[compact.chart_ptr[k]:compact.chart_ptr[k + 1]]
+        atlas.append(Chart(tiles[base], tiles[chart_tiles]))
+
+    return Topology(tiles, atlas)
+
+
+def place_normal_pieces(tiles):
+    # tiles[x, y] with x along the back rank, white on the first two rows and black on the last two
+    ysize = tiles.shape[1]
+
+    for x in range(8):
+        tiles[x, 1].piece = Piece("p", 0)
+        tiles[x, ysize - 2].piece = Piece("p", 1)
+
+    for x, shape in enumerate("RkBQKBkR"):
+        tiles[x, 0].piece = Piece(shape, 0)
+        tiles[x, ysize - 1].piece = Piece(shape, 1)
+
+
+def create_normal_board():
+    xsize = ysize = 8
+
+    topo = topology_from_compact(rect_topology(xsize, ysize))
+    place_normal_pieces(topo.tiles.reshape(xsize, ysize))
+
+    return topo
+
+
+def create_headless_chess(builder=create_normal_board, rules=None):
+    game = HeadlessChess()
+    game.set_topo(builder())
+    game.load_chess_state(ChessState(game, rules))
+
+    return game
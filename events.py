@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import deque
+
+
+CLICK = "click"
+NETWORK = "network"
+TIMER = "timer"
+USER = "user"
+
+KINDS = (CLICK, NETWORK, TIMER, USER)
+
+
+class EventQueue:
+    # producers block while the queue is full, so no event is ever dropped
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.events = deque()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.closed = False
+
+        self.puts = 0
+        self.batches = 0
+        self.blocked_puts = 0
+        self.blocked_time = 0.0
+        self.max_depth = 0
+
+    def put(self, event):
+        with self.not_full:
+            if len(self.events) >= self.maxsize:
+                self.blocked_puts += 1
+                start = time.perf_counter()
+
+                while len(self.events) >= self.maxsize and not self.closed:
+                    self.not_full.wait()
+
+                self.blocked_time += time.perf_counter() - start
+
+            if self.closed:
+                return False
+
+            self.events.append(event)
+            self.puts += 1
+            self.max_depth = max(self.max_depth, len(self.events))
+            self.not_empty.notify()
+
+            return True
+
+    def get_batch(self, timeout=None):
+        with self.not_empty:
+            if not self.events and not self.closed:
+                self.not_empty.wait(timeout)
+
+            batch = list(self.events)
+            self.events.clear()
+
+            if batch:
+                self.batches += 1
+                self.not_full.notify_all()
+
+            return batch
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def stats(self):
+        with self.lock:
+            return {"depth": len(self.events), "maxsize": self.maxsize, "puts": self.puts, "batches": self.batches,
+                    "blocked_puts": self.blocked_puts, "blocked_time": self.blocked_time,
+                    "max_depth": self.max_depth}
+
+
+def dispatch(batch, handlers):
+    unhandled = []
+
+    for kind, data in batch:
+        handler = handlers.get(kind)
+
+        if handler:
+            handler(data)
+        else:
+            unhandled.append((kind, data))
+
+    return unhandled
+
+
+def schedule(events, delay, callback):
+    timer = threading.Timer(delay, events.put, args=[(TIMER, callback)])
+    timer.daemon = True
+    timer.start()
+
+    return timer
@@ -0,0 +1,151 @@
+import mmap
+import struct
+
+import numpy as np
+
+from compact import CompactBoard, EMPTY
+from engine import ChessState
+
+
+# [header][block 0][block 1]... where block k is a snapshot of the position at ply k * interval followed by
+# interval move records; every block has the same size, so any ply is found with arithmetic alone
+MAGIC = b"CHLG"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQII")
+RECORD_DTYPE = np.dtype([("a", "<u4"), ("b", "<u4")])
+
+
+def snapshot_size(size):
+    # the piece codes and the turn, padded to 8 bytes
+    return -(-(size + 1) // 8) * 8
+
+
+def apply_move(board, a, b):
+    board.pieces[b] = board.pieces[a]
+    board.pieces[a] = EMPTY
+    board.turn = 1 - board.turn
+
+
+class GameLogWriter:
+    def __init__(self, file, board, interval=64):
+        self.file = file
+        self.board = board.copy()
+        self.interval = interval
+        self.plies = 0
+
+        topo = board.topo
+        file.write(HEADER.pack(MAGIC, VERSION, 0, topo.fingerprint, topo.size, interval))
+        self.write_snapshot()
+
+    def write_snapshot(self):
+        size = self.board.topo.size
+        data = np.zeros(snapshot_size(size), dtype=np.int8)
+        data[:size] = self.board.pieces
+        data[size] = self.board.turn
+
+        self.file.write(data.tobytes())
+
+    def append(self, a, b):
+        self.file.write(np.array((a, b), dtype=RECORD_DTYPE).tobytes())
+        apply_move(self.board, a, b)
+        self.plies += 1
+
+        if not self.plies % self.interval:
+            self.write_snapshot()
+
+        self.file.flush()
+
+
+class GameLogObserver:
+    # records the moves of a HeadlessChess as they are made
+    def __init__(self, game, file, interval=64):
+        self.index = game.topo.index
+        self.writer = GameLogWriter(file, game.chess_state.to_compact(), interval)
+
+    def selected(self, tile):
+        pass
+
+    def deselected(self, tile):
+        pass
+
+    def moved(self, a, b):
+        self.writer.append(self.index[a], self.index[b])
+
+
+class GameLog:
+    def __init__(self, path, topo=None):
+        self.topo = topo
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, self.fingerprint, self.size, self.interval = HEADER.unpack_from(self.map)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} game log")
+
+        if topo is not None and topo.fingerprint != self.fingerprint:
+            raise ValueError(f"log for topology {self.fingerprint:016x}, expected {topo.fingerprint:016x}")
+
+        self.snapshot_size = snapshot_size(self.size)
+        self.block_size = self.snapshot_size + self.interval * RECORD_DTYPE.itemsize
+
+        # a record or snapshot cut short by a crash is ignored
+        blocks, rest = divmod(len(self.map) - HEADER.size, self.block_size)
+        records = max(0, rest - self.snapshot_size) // RECORD_DTYPE.itemsize
+        self.snapshots = blocks + (rest >= self.snapshot_size)
+        self.plies = blocks * self.interval + records
+
+    def __len__(self):
+        return self.plies
+
+    def block_offset(self, block):
+        return HEADER.size + block * self.block_size
+
+    def move(self, ply):
+        if not 0 <= ply < self.plies:
+            raise IndexError(ply)
+
+        block, k = divmod(ply, self.interval)
+        record = np.frombuffer(self.map, dtype=RECORD_DTYPE, count=1,
+                               offset=self.block_offset(block) + self.snapshot_size + k * RECORD_DTYPE.itemsize)[0]
+
+        return int(record["a"]), int(record["b"])
+
+    def board(self, ply):
+        # the position before the move of ply, from the nearest snapshot and at most interval moves
+        if not 0 <= ply <= self.plies:
+            raise IndexError(ply)
+
+        block = min(ply // self.interval, self.snapshots - 1)
+        offset = self.block_offset(block)
+        data = np.frombuffer(self.map, dtype=np.int8, count=self.size + 1, offset=offset)
+
+        board = CompactBoard(self.topo, data[:self.size].copy(), int(data[self.size]))
+        start = block * self.interval
+
+        if ply > start:
+            records = np.frombuffer(self.map, dtype=RECORD_DTYPE, count=ply - start,
+                                    offset=offset + self.snapshot_size)
+
+            for a, b in records.tolist():
+                apply_move(board, a, b)
+
+        return board
+
+    def state(self, ply, topo, game):
+        # a ChessState on the tile graph topo, set to the position before ply
+        state = ChessState(game)
+        state.topo = topo
+        state.load_compact(self.board(ply))
+
+        return state
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
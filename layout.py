@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+
+def chart_embedding(chart):
+    # positions of the chart's tiles in units of the neighbour vectors, with the base at the origin
+    tiles = set(chart.tiles)
+    positions = {chart.base: (0.0, 0.0)}
+    edges = []
+
+    q = deque([chart.base])
+
+    while q:
+        current = q.popleft()
+        x, y = positions[current]
+
+        for neigh, vec in current.neighs.items():
+            dx, dy = float(vec[0]), float(vec[1])
+            edges.append((current, neigh, dx, dy))
+
+            if neigh in tiles and neigh not in positions:
+                positions[neigh] = x + dx, y + dy
+                q.append(neigh)
+
+    return positions, edges
+
+
+class TileIndex:
+    # uniform grid over the tile centres with cells as wide as a tile, so a point only has to look at its own
+    # cell and the eight around it
+    def __init__(self, positions, radius):
+        self.radius = radius
+        self.cell = cell = 2 * radius
+        self.cells = {}
+
+        for tile, (x, y) in positions.items():
+            self.cells.setdefault((int(x // cell), int(y // cell)), []).append((x, y, tile))
+
+    def tile_at(self, x, y):
+        # the tile whose circle contains (x, y), the nearest one if circles overlap
+        cx, cy = int(x // self.cell), int(y // self.cell)
+        best, best_d = None, self.radius ** 2
+
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for tx, ty, tile in self.cells.get((i, j), ()):
+                    d = (tx - x) ** 2 + (ty - y) ** 2
+
+                    if d <= best_d:
+                        best, best_d = tile, d
+
+        return best
+
+
+class ChartLayout:
+    def __init__(self, positions, edges, size, dr):
+        cx, cy = size[0] / 2, size[1] / 2
+
+        self.size = size
+        self.dr = dr
+        self.radius = R = dr / 4
+        self.positions = {tile: (cx + dr * x, cy + dr * y) for tile, (x, y) in positions.items()}
+        self.segments = []
+
+        drawn = set()
+
+        for current, neigh, dx, dy in edges:
+            if (neigh, current) in drawn:
+                continue
+
+            drawn.add((current, neigh))
+
+            x, y = self.positions[current]
+            dx, dy = dr * dx, dr * dy
+            dl = np.hypot(dx, dy)
+
+            self.segments.append((current, neigh,
+                                  x + R * dx / dl, y + R * dy / dl,
+                                  x + dx - R * dx / dl, y + dy - R * dy / dl))
+
+        self.index = TileIndex(self.positions, R)
+
+    def tile_at(self, x, y):
+        return self.index.tile_at(x, y)
+
+
+class LayoutCache:
+    # embeddings are kept per chart and screen layouts per (chart, size), both until the topology is recompiled
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.embeddings = {}
+        self.layouts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def embedding(self, topo, chart):
+        entry = self.embeddings.get(chart)
+
+        if entry is None or entry[0] != topo.version:
+            entry = self.embeddings[chart] = topo.version, chart_embedding(chart)
+
+        return entry[1]
+
+    def get(self, topo, chart, size, dr=40):
+        key = chart, size, dr
+
+        with self.lock:
+            entry = self.layouts.get(key)
+
+            if entry is not None and entry[0] == topo.version:
+                self.layouts.move_to_end(key)
+                return entry[1]
+
+            layout = ChartLayout(*self.embedding(topo, chart), size, dr)
+            self.layouts[key] = topo.version, layout
+
+            while len(self.layouts) > self.maxsize:
+                self.layouts.popitem(last=False)
+
+            return layout
+
+    def invalidate(self, chart=None):
+        with self.lock:
+            if chart is None:
+                self.embeddings.clear()
+                self.layouts.clear()
+            else:
+                self.embeddings.pop(chart, None)
+
+                for key in [key for key in self.layouts if key[0] is chart]:
+                    del self.layouts[key]
+
+
+layouts = LayoutCache()
@@ -0,0 +1,32 @@
+import importlib
+import sys
+import threading
+
+
+class LazyModule:
+    # stands in for a module until an attribute is first read, then imports it the normal way; sys.modules only
+    # ever holds the real module, and the lock makes threads that get there together wait for one import
+    def __init__(self, name):
+        self._lazy_name = name
+        self._lazy_lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        with self._lazy_lock:
+            if "_lazy_module" not in self.__dict__:
+                module = importlib.import_module(self._lazy_name)
+
+                # later reads find the module's names here without coming through __getattr__
+                self.__dict__.update(vars(module))
+                self._lazy_module = module
+
+        return getattr(self._lazy_module, attribute)
+
+    def __repr__(self):
+        return f"<lazy module {self._lazy_name!r}>"
+
+
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+
+    return LazyModule(name)
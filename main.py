@@ -4,16 +4,11 @@ from objects import *
 from rules import *
 
 
-game = Game()
-
-
 # load tk
 def make_single_window_app(game):
     game.root = tk.Tk()
 
 
-make_single_window_app(game)
-
 # load topo widget
 # set_topo(game, topo)
 
@@ -51,8 +46,17 @@ def simple_chess_validate_move(game):
     ...
 
 
-load_interrupt_loop(game)
-set_buffer_input(game)
-set_bufferers(game, simple_chess_click_validator, simple_chess_validate_move)
-make_turn_based(game)
-start(game)
+def main():
+    game = Game()
+
+    make_single_window_app(game)
+
+    load_interrupt_loop(game)
+    set_buffer_input(game)
+    set_bufferers(game, simple_chess_click_validator, simple_chess_validate_move)
+    make_turn_based(game)
+    start(game)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from compact import CompactBoard, CompactTopology, FIELDS, compact_move_iter, code_owner
+from engine import ChessState, topology_from_compact
+from search import Search, AnalysisGame, MATE_BOUND
+
+
+ALIGN = 64
+
+
+class SharedTopology:
+    # every array of a CompactTopology packed into one shared memory block; spec is what workers need to attach
+    def __init__(self, compact):
+        layout = []
+        offset = 0
+
+        for name in FIELDS:
+            a = np.ascontiguousarray(getattr(compact, name))
+            layout.append((name, a.dtype.str, a.shape, offset))
+            offset += -(-a.nbytes // ALIGN) * ALIGN
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.spec = self.shm.name, layout
+
+        for name, dtype, shape, start in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=start)
+            view[...] = getattr(compact, name)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach_topology(spec):
+    name, layout = spec
+    shm = shared_memory.SharedMemory(name=name)
+
+    arrays = {field: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)
+              for field, dtype, shape, start in layout}
+
+    return shm, CompactTopology(**arrays)
+
+
+# per worker process: the topology is rebuilt once in the initializer, tasks only carry the pieces
+worker = {}
+
+
+def init_worker(spec):
+    shm, compact = attach_topology(spec)
+    topo = topology_from_compact(compact)
+
+    state = ChessState(AnalysisGame())
+    state.topo = topo
+
+    worker.update(shm=shm, compact=compact, topo=topo, state=state, table={})
+
+
+def load_position(pieces, turn):
+    state = worker["state"]
+    state.load_compact(CompactBoard(worker["compact"], np.frombuffer(pieces, dtype=np.int8), turn))
+
+    return state
+
+
+def search_task(pieces, turn, budget_ms, root=None, max_depth=64):
+    # root is a list of (a, b) tile indices, None searches every move
+    state = load_position(pieces, turn)
+    tiles = worker["topo"].tiles
+
+    if root is not None:
+        root = {(tiles[a], tiles[b]) for a, b in root}
+
+    search = Search(state, budget_ms, max_depth, root=root)
+    search.table = worker["table"]
+
+    move = search.best_move()
+    index = worker["topo"].index
+
+    if move is not None:
+        move = index[move[0]], index[move[1]]
+
+    return move, search.score, search.depth, search.nodes
+
+
+def root_moves(board):
+    moves = []
+
+    for a in np.flatnonzero(board.pieces).tolist():
+        if code_owner(board.pieces[a]) == board.turn:
+            moves += [(a, b) for b in dict.fromkeys(int(b) for b in compact_move_iter(board, a))]
+
+    return moves
+
+
+class ParallelSearch:
+    def __init__(self, compact, workers=None):
+        self.compact = compact
+        self.workers = workers or os.cpu_count()
+        self.shared = SharedTopology(compact)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(self.shared.spec,))
+
+    def best_move(self, board, budget_ms=100, max_depth=64):
+        # root split: each worker searches every workers-th root move, in lockstep so that every share finishes
+        # depth d before any starts d + 1; scores from different depths are not comparable, so the deepest
+        # round that every share finished picks the move
+        moves = root_moves(board)
+
+        if not moves:
+            return None, 0
+
+        pieces = board.pieces.tobytes()
+        shares = [moves[k::self.workers] for k in range(min(self.workers, len(moves)))]
+        deadline = time.perf_counter() + budget_ms / 1000
+        best = None
+
+        for depth in range(1, max_depth + 1):
+            remaining = 1000 * (deadline - time.perf_counter())
+
+            if remaining <= 0:
+                break
+
+            futures = [self.pool.submit(search_task, pieces, board.turn, remaining, share, depth) for share in shares]
+            results = [future.result() for future in futures]
+
+            # a share stops short of depth when its time runs out, or on purpose once it has found a mate
+            if any(r[0] is None or r[2] < depth and abs(r[1]) <= MATE_BOUND for r in results):
+                break
+
+            best = max(results, key=lambda r: r[1])
+
+            if abs(best[1]) > MATE_BOUND:
+                break
+
+        if best is None:
+            # not even depth 1 finished in every share, any legal move is better than none
+            return moves[0], 0
+
+        return best[0], best[1]
+
+    def analyse(self, boards, budget_ms=100):
+        # independent positions, one task each; yields (move, score, depth, nodes) in order
+        boards = list(boards)
+
+        return self.pool.map(search_task, [b.pieces.tobytes() for b in boards], [b.turn for b in boards],
+                             [budget_ms] * len(boards))
+
+    def close(self):
+        self.pool.shutdown()
+        self.shared.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,247 @@
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from builders import torus_topology, grid_topology, HEX
+from compact import code_shape, code_owner, compact_move_iter
+from discretize import sphere_board
+from engine import create_normal_board, topology_from_compact, place_normal_pieces, piece_move_iter, ChessState
+
+
+def normal_board():
+    return create_normal_board()
+
+
+def torus_board():
+    # the armies stand as on the normal board in rows 0-7 of 12, so four empty rows separate them on either side
+    # of the wrap; at this height no slider sees the other king across it either
+    topo = topology_from_compact(torus_topology(8, 12))
+    place_normal_pieces(topo.tiles.reshape(8, 12)[:, :8])
+
+    return topo
+
+
+def hex_board():
+    # hex adjacency with the axial offsets as edge vectors: laid out with HEX_BASIS no two directions are 45 or
+    # 90 degrees apart, so bishops and knights would never move and rooks only along one axis; here rooks slide
+    # along two of the three axes, bishops along the third and knights turn between the two rook axes
+    topo = topology_from_compact(grid_topology(8, 8, HEX))
+    place_normal_pieces(topo.tiles.reshape(8, 8))
+
+    return topo
+
+
+def irregular_board():
+    # a sphere with a pole tile at either end, the pieces sit on eight of its meridians
+    nu, nv = 16, 8
+    topo = topology_from_compact(sphere_board(nu, nv)[0])
+    place_normal_pieces(topo.tiles[:nu * nv].reshape(nu, nv)[:8])
+
+    return topo
+
+
+BOARDS = {
+    "normal": normal_board,
+    "torus": torus_board,
+    "hex": hex_board,
+    "irregular": irregular_board,
+}
+
+# reference counts for this engine's rules, which are not standard chess: pawns only single-step,
+# there is no castling, en passant or promotion, pieces may take their own side and the game
+# ends when a side loses its last king, so the usual 20, 400, 8902 do not apply; they were
+# recorded from this engine itself, not derived independently, so they only catch regressions
+# and would not notice a generator that has always been wrong
+KNOWN = {
+    "normal": {1: 36, 2: 1260, 3: 49510},
+    "torus": {1: 105, 2: 10776},
+    "hex": {1: 28, 2: 756, 3: 21998},
+    "irregular": {1: 70, 2: 4830},
+}
+
+
+class Timings:
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+
+    def add(self, shape, seconds):
+        self.calls[shape] = self.calls.get(shape, 0) + 1
+        self.seconds[shape] = self.seconds.get(shape, 0.0) + seconds
+
+
+def perft_objects(topo, turn, depth, kings, timings=None):
+    # raw generator perft on the tile objects, kings[owner] counts the kings still on the board
+    if depth == 0:
+        return 1
+
+    if not kings[turn] or not kings[1 - turn]:
+        return 0
+
+    nodes = 0
+
+    for a in [tile for tile in topo.tiles if tile.piece and tile.piece.owner == turn]:
+        piece = a.piece
+
+        if timings:
+            start = time.perf_counter()
+            targets = dict.fromkeys(piece_move_iter(piece, topo, a))
+            timings.add(piece.shape, time.perf_counter() - start)
+        else:
+            targets = dict.fromkeys(piece_move_iter(piece, topo, a))
+
+        for b in targets:
+            captured = b.piece
+            a.piece, b.piece = None, piece
+
+            if captured and captured.shape == "K":
+                kings[captured.owner] -= 1
+
+            nodes += perft_objects(topo, 1 - turn, depth - 1, kings, timings)
+
+            if captured and captured.shape == "K":
+                kings[captured.owner] += 1
+
+            a.piece, b.piece = piece, captured
+
+    return nodes
+
+
+def perft_compact(board, depth, kings, timings=None):
+    if depth == 0:
+        return 1
+
+    turn = board.turn
+
+    if not kings[turn] or not kings[1 - turn]:
+        return 0
+
+    nodes = 0
+    pieces = board.pieces
+
+    for a in np.flatnonzero(pieces).tolist():
+        code = pieces[a]
+
+        if code_owner(code) != turn:
+            continue
+
+        if timings:
+            start = time.perf_counter()
+            targets = dict.fromkeys(int(b) for b in compact_move_iter(board, a))
+            timings.add(code_shape(code), time.perf_counter() - start)
+        else:
+            targets = dict.fromkeys(int(b) for b in compact_move_iter(board, a))
+
+        for b in targets:
+            captured = pieces[b]
+            king = captured and code_shape(captured) == "K"
+            pieces[a], pieces[b] = 0, code
+            board.turn = 1 - turn
+
+            if king:
+                kings[code_owner(captured)] -= 1
+
+            nodes += perft_compact(board, depth - 1, kings, timings)
+
+            if king:
+                kings[code_owner(captured)] += 1
+
+            pieces[a], pieces[b] = code, captured
+            board.turn = turn
+
+    return nodes
+
+
+class PerftGame:
+    def __init__(self):
+        self.turn = 0
+
+
+def perft_state(state, depth):
+    # through ChessState.make_move and unmake_move
+    if depth == 0:
+        return 1
+
+    if state.reach is None:
+        state.setup()
+
+    nodes = 0
+
+    for a, b in [(a, b) for a in list(state.reach) for b in state.targets(a)]:
+        undo = state.make_move(a, b)
+
+        if undo is not None:
+            nodes += perft_state(state, depth - 1)
+            state.unmake_move(undo)
+
+    return nodes
+
+
+def count_kings(topo):
+    kings = [0, 0]
+
+    for tile in topo.tiles:
+        if tile.piece and tile.piece.shape == "K":
+            kings[tile.piece.owner] += 1
+
+    return kings
+
+
+def run(name, depth, memory=False):
+    topo = BOARDS[name]()
+    game = PerftGame()
+    state = ChessState(game)
+    state.topo = topo
+    board = state.to_compact()
+
+    results = {}
+
+    for backend in ["objects", "compact", "state"]:
+        timings = Timings()
+        start = time.perf_counter()
+
+        if backend == "objects":
+            nodes = perft_objects(topo, 0, depth, count_kings(topo), timings)
+        elif backend == "compact":
+            nodes = perft_compact(board, depth, count_kings(topo), timings)
+        else:
+            nodes = perft_state(state, depth)
+
+        elapsed = time.perf_counter() - start
+        results[backend] = nodes
+
+        print(f"{name:10} {backend:8} depth {depth}  nodes {nodes:10}  {nodes / elapsed:12.0f} nodes/s")
+
+        for shape in sorted(timings.seconds):
+            seconds = timings.seconds[shape]
+            calls = timings.calls[shape]
+            print(f"    {shape}  {calls:9} calls  {seconds:8.3f} s  {1e6 * seconds / calls:8.2f} us/call")
+
+    if len(set(results.values())) > 1:
+        raise AssertionError(f"{name}: the backends disagree at depth {depth}: {results}")
+
+    known = KNOWN.get(name, {}).get(depth)
+
+    if known is not None and known != results["objects"]:
+        raise AssertionError(f"{name}: {results['objects']} nodes at depth {depth}, expected {known}")
+
+    if memory:
+        tracemalloc.start()
+        perft_objects(topo, 0, depth, count_kings(topo))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"    peak traced memory {peak / 1024:.1f} KiB")
+
+    return results["objects"]
+
+
+def main(depth=2, names=tuple(BOARDS)):
+    for name in names:
+        run(name, depth, memory=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2, sys.argv[2:] or tuple(BOARDS))
@@ -0,0 +1,66 @@
+import struct
+
+import numpy as np
+
+from compact import SHAPES
+
+
+# a frame is [length u32][fingerprint u64][count u32] followed by count fixed-width move records
+LENGTH = struct.Struct("<I")
+HEADER = struct.Struct("<QI")
+MOVE_DTYPE = np.dtype([("game", "<u4"), ("a", "<u4"), ("b", "<u4"), ("promotion", "u1")])
+
+NO_PROMOTION = 0
+
+
+def promotion_code(shape):
+    return NO_PROMOTION if shape is None else 1 + SHAPES.index(shape)
+
+
+def promotion_shape(code):
+    return None if code == NO_PROMOTION else SHAPES[code - 1]
+
+
+def encode_frame(fingerprint, moves):
+    records = np.array(moves, dtype=MOVE_DTYPE) if len(moves) else np.empty(0, dtype=MOVE_DTYPE)
+    body = HEADER.pack(fingerprint, len(records)) + records.tobytes()
+
+    return LENGTH.pack(len(body)) + body
+
+
+def decode_body(body, fingerprint=None):
+    frame_fingerprint, count = HEADER.unpack_from(body)
+
+    if fingerprint is not None and frame_fingerprint != fingerprint:
+        raise ValueError(f"frame for topology {frame_fingerprint:016x}, expected {fingerprint:016x}")
+
+    return frame_fingerprint, np.frombuffer(body, dtype=MOVE_DTYPE, count=count, offset=HEADER.size)
+
+
+def decode_frame(data, fingerprint=None):
+    length, = LENGTH.unpack_from(data)
+
+    return decode_body(data[LENGTH.size:LENGTH.size + length], fingerprint)
+
+
+def split_frames(buffer):
+    # returns the complete frame bodies in buffer and the unconsumed remainder
+    bodies = []
+    offset = 0
+
+    while len(buffer) - offset >= LENGTH.size:
+        length, = LENGTH.unpack_from(buffer, offset)
+
+        if len(buffer) - offset - LENGTH.size < length:
+            break
+
+        bodies.append(buffer[offset + LENGTH.size:offset + LENGTH.size + length])
+        offset += LENGTH.size + length
+
+    return bodies, buffer[offset:]
+
+
+async def read_frame(reader, fingerprint=None):
+    length, = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+
+    return decode_body(await reader.readexactly(length), fingerprint)
@@ -6,6 +6,7 @@ import enum
 import numpy as np
 
 from objects import *
+from widgets import *
 
 
 def create_rect_topo(xsize, ysize):
@@ -148,24 +149,28 @@ def change_turn(game):
 
 
 # move this to main.py
-game = GameAuto()
+def run_prototype():
+    global game, board_wid
 
-create_window(game)
+    game = GameAuto()
 
-game.load_board(create_rect_topo(8, 8))
+    create_window(game)
 
-board_wid = TopoBoardWidget(game.root, game.board)
-board_wid.pack(fill=tk.BOTH, expand=True)
+    game.load_board(create_rect_topo(8, 8))
 
-# game.board.tiles[3, 2].piece = Piece("P", "white")
-# game.board.tiles[4, 5].piece = Piece("P", "black")
+    board_wid = TopoBoardWidget(game.root, game.board)
+    board_wid.pack(fill=tk.BOTH, expand=True)
 
-board_wid.bind("<Button-1>", click_board)
+    # game.board.tiles[3, 2].piece = Piece("P", "white")
+    # game.board.tiles[4, 5].piece = Piece("P", "black")
 
-game.root.after(100, board_wid.draw)
+    board_wid.bind("<Button-1>", click_board)
+
+    game.root.after(100, board_wid.draw)
+
+    game.root.mainloop()
 
 
-game.root.mainloop()
 # game.load_pieces(PieceTypes)
 
 
@@ -195,7 +200,7 @@ def start(game):
                 game.interrupt_handler(game.event)
 
     game_thread = threading.Thread(target=f)
-    game_thread.run()
+    game_thread.start()
 
 
 def make_turn_based(game):
@@ -226,3 +231,7 @@ def buffer_event(game, event):
 
 def reset_buffer(game):
     game.input_buffer = []
+
+
+if __name__ == "__main__":
+    run_prototype()
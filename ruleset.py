@@ -0,0 +1,140 @@
+from compact import SHAPES
+
+
+# moves rules generate targets, legal rules filter them and moved rules see each move after it is made
+MOVES = "moves"
+LEGAL = "legal"
+MOVED = "moved"
+EVENTS = MOVES, LEGAL, MOVED
+
+
+class Rule:
+    def __init__(self, name, event, action, shapes=None, requires=(), fields=(), royal=()):
+        if event not in EVENTS:
+            raise ValueError(f"rule {name}: unknown event {event}")
+
+        self.name = name
+        self.event = event
+        self.action = action
+        self.shapes = shapes or SHAPES
+        self.requires = tuple(requires)
+        self.fields = tuple(fields)
+        self.royal = tuple(royal)
+
+
+RULES = {}
+
+
+def register(name, event, shapes=None, requires=(), fields=(), royal=()):
+    # fields are "Kind.attribute" pairs, the kinds are the objects handed to Ruleset.check; royal are the shapes
+    # whose pieces the rule needs ChessState to keep in its kings sets
+    def decorator(action):
+        if name in RULES:
+            raise ValueError(f"rule {name} is already registered")
+
+        RULES[name] = Rule(name, event, action, shapes, requires, fields, royal)
+
+        return action
+
+    return decorator
+
+
+def resolve(names):
+    # the named rules and everything they require, each rule after its requirements
+    order = []
+    done = set()
+    active = []
+
+    def visit(name):
+        if name in done:
+            return
+
+        if name in active:
+            raise ValueError("rules require each other: " + " -> ".join(active + [name]))
+
+        if name not in RULES:
+            raise ValueError(f"unknown rule {name}" + (f", required by {active[-1]}" if active else ""))
+
+        active.append(name)
+
+        for required in RULES[name].requires:
+            visit(required)
+
+        active.pop()
+        done.add(name)
+        order.append(RULES[name])
+
+    for name in names:
+        visit(name)
+
+    return order
+
+
+def no_moves(piece, topo, tile):
+    return ()
+
+
+def chain(generators):
+    def moves(piece, topo, tile):
+        for generate in generators:
+            yield from generate(piece, topo, tile)
+
+    return moves
+
+
+def filtered(generate, predicates):
+    def moves(piece, topo, tile):
+        for target in generate(piece, topo, tile):
+            if all(legal(piece, topo, tile, target) for legal in predicates):
+                yield target
+
+    return moves
+
+
+class Ruleset:
+    # requirements are resolved once here, what is left is a table of callables per event and piece shape
+    def __init__(self, names):
+        self.rules = resolve(names)
+        self.key = tuple(rule.name for rule in self.rules)
+        self.fields = sorted({field for rule in self.rules for field in rule.fields})
+
+        table = {event: {shape: [] for shape in SHAPES} for event in EVENTS}
+
+        for rule in self.rules:
+            for shape in rule.shapes:
+                table[rule.event][shape].append(rule.action)
+
+        # moves yields the pseudo-moves ChessState tracks in its reach maps, legal holds the predicates a target
+        # must pass when the move is played and targets combines the two
+        self.moves = {}
+        self.legal = {shape: tuple(table[LEGAL][shape]) for shape in SHAPES}
+        self.targets = {}
+
+        for shape in SHAPES:
+            generators, predicates = table[MOVES][shape], self.legal[shape]
+
+            if not generators:
+                self.moves[shape] = self.targets[shape] = no_moves
+                continue
+
+            generate = self.moves[shape] = generators[0] if len(generators) == 1 else chain(generators)
+            self.targets[shape] = filtered(generate, predicates) if predicates else generate
+
+        self.moved = {shape: tuple(table[MOVED][shape]) for shape in SHAPES}
+        self.royal = {shape: any(shape in rule.royal for rule in self.rules) for shape in SHAPES}
+
+    def check(self, objects):
+        # objects maps a kind to an instance of it; raises if a rule needs a field that is missing
+        missing = []
+
+        for field in self.fields:
+            kind, attribute = field.split(".")
+
+            if kind not in objects or not hasattr(objects[kind], attribute):
+                missing.append(field)
+
+        if missing:
+            raise ValueError("missing fields for rules " + ", ".join(self.key) + ": " + ", ".join(missing))
+
+    def __contains__(self, name):
+        return name in self.key
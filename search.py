@@ -0,0 +1,269 @@
+import time
+
+from engine import ChessState
+
+
+VALUES = {"K": 0, "Q": 9, "R": 5, "B": 3, "k": 3, "p": 1}
+MATE = 100000
+MATE_BOUND = MATE - 1000
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def evaluate(state):
+    # material from the side to move's point of view, kings count through the winner only
+    score = 0
+
+    for tile in state.reach:
+        piece = tile.piece
+        score += VALUES[piece.shape] if piece.owner == state.game.turn else -VALUES[piece.shape]
+
+    return score
+
+
+def to_table(score, ply):
+    # mate scores are stored relative to the node so they stay valid wherever the position recurs
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def from_table(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Search:
+    # iterative deepening negamax with alpha-beta, a transposition table keyed by the zobrist hash
+    # and mvv-lva move ordering; works on any topology since it only sees ChessState's reach maps
+    def __init__(self, state, budget_ms=100, max_depth=64, table_size=2 ** 20, root=None):
+        self.state = state
+        self.root = root
+        self.budget = budget_ms / 1000
+        self.max_depth = max_depth
+        self.table_size = table_size
+        self.table = {}
+
+        self.deadline = None
+        self.best = None
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+
+    def moves(self, best=None):
+        state = self.state
+        turn = state.game.turn
+        royal = state.rules.royal
+        moves = []
+
+        for a in state.reach:
+            attacker = a.piece
+
+            if attacker.owner != turn:
+                continue
+
+            for b in state.targets(a):
+                victim = b.piece
+
+                if victim and victim.owner != turn:
+                    order = 16 * (VALUES[victim.shape] + 1) - VALUES[attacker.shape] + 100 * royal[victim.shape]
+                elif victim:
+                    order = -32
+                else:
+                    order = 0
+
+                moves.append((order, a, b))
+
+        moves.sort(key=lambda m: m[0], reverse=True)
+
+        if best is not None:
+            for i, (_, a, b) in enumerate(moves):
+                if (a, b) == best:
+                    moves.insert(0, moves.pop(i))
+                    break
+
+        return [(a, b) for _, a, b in moves]
+
+    def tick(self):
+        self.nodes += 1
+
+        if not self.nodes & 63 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+    def terminal(self, ply):
+        winner = self.state.winner
+
+        return MATE - ply if winner == self.state.game.turn else -(MATE - ply)
+
+    def quiesce(self, alpha, beta, ply):
+        self.tick()
+        state = self.state
+
+        if state.winner is not None:
+            return self.terminal(ply)
+
+        stand = evaluate(state)
+
+        if stand >= beta:
+            return stand
+
+        alpha = max(alpha, stand)
+        turn = state.game.turn
+
+        for a, b in self.moves():
+            if not b.piece or b.piece.owner == turn:
+                break
+
+            undo = state.make_move(a, b)
+
+            try:
+                score = -self.quiesce(-beta, -alpha, ply + 1)
+            finally:
+                state.unmake_move(undo)
+
+            if score >= beta:
+                return score
+
+            alpha = max(alpha, score)
+
+        return alpha
+
+    def negamax(self, depth, alpha, beta, ply):
+        state = self.state
+
+        if state.winner is not None:
+            self.tick()
+            return self.terminal(ply)
+
+        if depth == 0:
+            return self.quiesce(alpha, beta, ply)
+
+        self.tick()
+
+        entry = self.table.get(state.hash)
+        best = None
+
+        if entry is not None:
+            entry_depth, score, flag, best = entry
+            score = from_table(score, ply)
+
+            if entry_depth >= depth and ply:
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+
+        original = alpha
+        best_score = -MATE - 1
+        best_move = None
+
+        moves = self.moves(best)
+
+        # a root split searches only its share of the root moves
+        if ply == 0 and self.root is not None:
+            moves = [move for move in moves if move in self.root]
+
+        for a, b in moves:
+            undo = state.make_move(a, b)
+
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                state.unmake_move(undo)
+
+            if score > best_score:
+                best_score, best_move = score, (a, b)
+
+            if score > alpha:
+                alpha = score
+
+            if alpha >= beta:
+                break
+
+        if best_move is None:
+            return evaluate(state)
+
+        if ply == 0:
+            self.best = best_move
+
+            # a partial root is not the position's true value, keep it out of a table shared between splits
+            if self.root is not None:
+                return best_score
+
+        flag = UPPER if best_score <= original else LOWER if best_score >= beta else EXACT
+
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+
+        self.table[state.hash] = depth, to_table(best_score, ply), flag, best_move
+
+        return best_score
+
+    def best_move(self):
+        # returns the best move of the deepest iteration that finished within the budget
+        state = self.state
+
+        if state.reach is None:
+            state.setup()
+
+        if state.winner is not None:
+            return None
+
+        self.deadline = time.perf_counter() + self.budget
+        self.nodes = 0
+        self.best = move = None
+
+        for depth in range(1, self.max_depth + 1):
+            try:
+                score = self.negamax(depth, -MATE - 1, MATE + 1, 0)
+            except SearchTimeout:
+                break
+
+            move = self.best
+            self.depth, self.score = depth, score
+
+            if abs(score) > MATE_BOUND:
+                break
+
+        if move is None:
+            moves = [move for move in self.moves() if self.root is None or move in self.root]
+            move = moves[0] if moves else None
+
+        return move
+
+
+def bot_move(game, budget_ms=100, search=None):
+    # plays the engine's move in a HeadlessChess so its observers see it like any other move
+    search = search or Search(game.chess_state, budget_ms)
+    move = search.best_move()
+
+    if move is not None:
+        game.move(*move)
+
+    return move
+
+
+class AnalysisGame:
+    def __init__(self, turn=0):
+        self.turn = turn
+
+
+def analyse(topo, turn=0, budget_ms=1000):
+    state = ChessState(AnalysisGame(turn))
+    state.topo = topo
+
+    search = Search(state, budget_ms)
+    move = search.best_move()
+
+    return move, search.score, search.depth, search.nodes
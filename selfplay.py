@@ -0,0 +1,165 @@
+import json
+import random
+import sys
+
+from engine import ChessState, create_normal_board
+from protocol import encode_frame, decode_body, split_frames, NO_PROMOTION
+from search import Search, AnalysisGame, VALUES
+
+
+def legal_moves(state):
+    turn = state.game.turn
+
+    return [(a, b) for a in state.reach if a.piece.owner == turn for b in state.targets(a)]
+
+
+class RandomPolicy:
+    def __init__(self, state, rng, budget_ms=None):
+        self.state = state
+        self.rng = rng
+
+    def choose(self):
+        moves = legal_moves(self.state)
+
+        return self.rng.choice(moves) if moves else None
+
+
+class GreedyPolicy(RandomPolicy):
+    # takes the most valuable enemy piece in reach, a king before anything else, otherwise plays at random
+    def choose(self):
+        moves = legal_moves(self.state)
+        turn = self.state.game.turn
+        best, best_value = [], 0
+
+        for a, b in moves:
+            victim = b.piece
+
+            if not victim or victim.owner == turn:
+                continue
+
+            value = 100 if victim.shape == "K" else VALUES[victim.shape]
+
+            if value > best_value:
+                best, best_value = [(a, b)], value
+            elif value == best_value:
+                best.append((a, b))
+
+        moves = best or moves
+
+        return self.rng.choice(moves) if moves else None
+
+
+class SearchPolicy:
+    def __init__(self, state, rng, budget_ms=20):
+        self.search = Search(state, budget_ms)
+
+    def choose(self):
+        return self.search.best_move()
+
+
+POLICIES = {
+    "random": RandomPolicy,
+    "greedy": GreedyPolicy,
+    "search": SearchPolicy,
+}
+
+
+class JsonLinesWriter:
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, game_id, winner, moves):
+        self.file.write(json.dumps({"game": game_id, "winner": winner, "plies": len(moves), "moves": moves}) + "\n")
+        self.file.flush()
+
+
+# a binary log is one protocol frame per game: its move records (game, a, b, NO_PROMOTION) in order, then a
+# result record (game, RESULT, RESULT, winner) with winner 0, 1 or UNFINISHED
+RESULT = 0xffffffff
+UNFINISHED = 2
+
+
+class BinaryWriter:
+    def __init__(self, file, fingerprint):
+        self.file = file
+        self.fingerprint = fingerprint
+
+    def write(self, game_id, winner, moves):
+        records = [(game_id, a, b, NO_PROMOTION) for a, b in moves]
+        records.append((game_id, RESULT, RESULT, UNFINISHED if winner is None else winner))
+
+        self.file.write(encode_frame(self.fingerprint, records))
+        self.file.flush()
+
+
+def read_binary(data, fingerprint=None):
+    # yields (game, winner, moves) from a binary log written by BinaryWriter
+    bodies, _ = split_frames(data)
+
+    for body in bodies:
+        _, records = decode_body(body, fingerprint)
+        game_id, a, b, winner = records[-1].tolist()
+
+        if a != RESULT or b != RESULT:
+            raise ValueError(f"game {game_id} has no result record")
+
+        moves = [(a, b) for _, a, b, _ in records[:-1].tolist()]
+
+        yield game_id, None if winner == UNFINISHED else winner, moves
+
+
+def play(state, start, policies, max_plies):
+    state.load_compact(start)
+    state.setup()
+    index = state.topo.index
+    moves = []
+
+    while state.winner is None and len(moves) < max_plies:
+        move = policies[state.game.turn].choose()
+
+        if move is None or not state.move(*move):
+            break
+
+        moves.append((index[move[0]], index[move[1]]))
+
+    return state.winner, moves
+
+
+def run(games, white="random", black="random", writer=None, builder=create_normal_board, max_plies=200, seed=0,
+        budget_ms=20):
+    # the position lives in a single ChessState reset from a snapshot per game, each game is written out as
+    # soon as it ends and only the result counts are kept
+    state = ChessState(AnalysisGame())
+    state.topo = builder()
+    start = state.to_compact()
+    rng = random.Random(seed)
+
+    policies = [POLICIES[name](state, rng, budget_ms) for name in (white, black)]
+
+    results = {0: 0, 1: 0, None: 0}
+
+    for game_id in range(games):
+        winner, moves = play(state, start, policies, max_plies)
+        results[winner] += 1
+
+        if writer:
+            writer.write(game_id, winner, moves)
+
+    return results
+
+
+def main(games=100, white="random", black="random", path=None):
+    if path is None:
+        results = run(games, white, black, JsonLinesWriter(sys.stdout))
+    elif path.endswith(".bin"):
+        with open(path, "wb") as file:
+            results = run(games, white, black, BinaryWriter(file, create_normal_board().compact().fingerprint))
+    else:
+        with open(path, "w") as file:
+            results = run(games, white, black, JsonLinesWriter(file))
+
+    print(f"white {results[0]}  black {results[1]}  unfinished {results[None]}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100, *sys.argv[2:5])
@@ -0,0 +1,328 @@
+import asyncio
+import itertools as itr
+import ssl
+import traceback
+
+from blind import BlindView
+from engine import create_headless_chess, create_normal_board
+from events import NETWORK, TIMER, USER, dispatch
+from protocol import encode_frame, NO_PROMOTION
+
+
+class AsyncEventQueue:
+    def __init__(self, maxsize=1024):
+        self.queue = asyncio.Queue(maxsize)
+        self.batches = 0
+        self.max_depth = 0
+
+    async def put(self, event):
+        await self.queue.put(event)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def get_batch(self):
+        batch = [await self.queue.get()]
+
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+        self.batches += 1
+
+        return batch
+
+
+class AsyncGame:
+    def __init__(self, game_id, server, builder, blind=False):
+        self.game_id = game_id
+        self.server = server
+        self.game = create_headless_chess(builder)
+        self.events = AsyncEventQueue()
+        self.subscribers = set()
+        self.watchers = set()
+        self.running = False
+
+        # in a blind game each player only gets the tiles their own pieces can see
+        self.view = BlindView(self.game.chess_state) if blind else None
+        self.players = {}
+
+        self.handlers = {
+            NETWORK: self.on_network,
+            TIMER: self.on_timer,
+            USER: self.on_user,
+        }
+
+    async def run(self):
+        self.running = True
+
+        while self.running:
+            # a handler that raises loses its own event only, the game keeps running
+            for event in await self.events.get_batch():
+                try:
+                    dispatch([event], self.handlers)
+                except Exception:
+                    traceback.print_exc()
+
+            await self.server.flush(self.subscribers)
+
+    def on_network(self, message):
+        sender, a, b = message
+        tiles = self.game.topo.tiles
+
+        # in a blind game only the player whose turn it is may move
+        if self.view and self.players.get(sender) != self.game.turn:
+            self.server.send([sender], f"ILLEGAL {self.game_id} {a} {b}")
+        elif self.game.move(tiles[a], tiles[b]):
+            if self.view:
+                for owner in (0, 1):
+                    self.send_seen(owner, self.view.flush(owner))
+            else:
+                self.server.send(self.subscribers, f"MOVED {self.game_id} {a} {b}")
+
+            self.server.push(self.watchers, (self.game_id, a, b, NO_PROMOTION))
+        else:
+            self.server.send([sender], f"ILLEGAL {self.game_id} {a} {b}")
+
+    def send_seen(self, owner, tiles):
+        writers = [writer for writer, player in self.players.items() if player == owner]
+        cells = " ".join(f"{i}:{code}" for i, code in tiles)
+
+        self.server.send(writers, f"SEEN {self.game_id} {self.game.turn} {cells}".rstrip())
+
+    def join(self, writer, owner):
+        state = self.game.chess_state
+
+        if state.reach is None:
+            state.setup()
+
+        # players already in catch up first, the new one starts from the full view
+        pending = self.view.flush(owner)
+
+        if pending:
+            self.send_seen(owner, pending)
+
+        self.players[writer] = owner
+        self.send_seen(owner, self.view.view(owner))
+
+    def on_timer(self, callback):
+        callback()
+
+    def on_user(self, command):
+        if command == "quit":
+            self.running = False
+
+    def status(self):
+        state = self.game.chess_state
+        winner = "-" if state.winner is None else state.winner
+
+        return f"STATE {self.game_id} {self.game.turn} {winner}"
+
+
+class GameServer:
+    # one event loop hosts every game, each game is a task draining its own event queue
+    def __init__(self, builder=create_normal_board):
+        self.builder = builder
+        self.games = {}
+        self.tasks = {}
+        self.ids = itr.count()
+        self.server = None
+
+        # binary spectators get the moves of all their games in one frame per loop iteration
+        self.fingerprint = None
+        self.pending = {}
+        self.flush_scheduled = False
+
+    def new_game(self, blind=False):
+        game_id = next(self.ids)
+        game = self.games[game_id] = AsyncGame(game_id, self, self.builder, blind)
+        self.tasks[game_id] = asyncio.ensure_future(game.run())
+
+        if self.fingerprint is None:
+            self.fingerprint = game.game.topo.compact().fingerprint
+
+        return game
+
+    async def close_game(self, game_id):
+        game = self.games.pop(game_id)
+        await game.events.put((USER, "quit"))
+        await self.tasks.pop(game_id)
+
+    def send(self, writers, line):
+        data = (line + "\n").encode()
+
+        for writer in writers:
+            if not writer.is_closing():
+                writer.write(data)
+
+    def push(self, writers, move):
+        for writer in writers:
+            self.pending.setdefault(writer, []).append(move)
+
+        if self.pending and not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush_pending)
+
+    def flush_pending(self):
+        pending, self.pending = self.pending, {}
+        self.flush_scheduled = False
+
+        for writer, moves in pending.items():
+            if not writer.is_closing():
+                writer.write(encode_frame(self.fingerprint, moves))
+
+    async def flush(self, writers):
+        for writer in list(writers):
+            try:
+                await writer.drain()
+            except ConnectionError:
+                writers.discard(writer)
+
+    async def handle(self, reader, writer):
+        joined = set()
+
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                words = line.decode().split()
+
+                try:
+                    await self.command(words, writer, joined)
+                except ValueError:
+                    self.send([writer], "ERROR " + " ".join(words))
+        finally:
+            for game_id in joined:
+                if game_id in self.games:
+                    self.games[game_id].subscribers.discard(writer)
+                    self.games[game_id].watchers.discard(writer)
+                    self.games[game_id].players.pop(writer, None)
+
+            writer.close()
+
+    async def command(self, words, writer, joined):
+        if not words:
+            return
+
+        op, args = words[0], words[1:]
+
+        if op == "NEW":
+            game = self.new_game(args[:1] == ["BLIND"])
+            game.subscribers.add(writer)
+            joined.add(game.game_id)
+            self.send([writer], f"GAME {game.game_id}")
+        elif op in ("JOIN", "WATCH", "STATE", "MOVE") and args and int(args[0]) in self.games:
+            game = self.games[int(args[0])]
+
+            if op == "WATCH":
+                # spectators get every move, which would give a blind game away
+                if game.view:
+                    raise ValueError("blind games cannot be watched")
+
+                game.watchers.add(writer)
+                joined.add(game.game_id)
+                self.send([writer], f"FINGERPRINT {self.fingerprint}")
+            elif op == "JOIN":
+                seat = int(args[1]) if game.view and len(args) == 2 else None
+
+                # a seat in a blind game is taken by one connection, and a connection takes one seat
+                taken = seat in game.players.values() or writer in game.players
+
+                if seat is not None and (seat not in (0, 1) or taken):
+                    raise ValueError(f"seat {seat} is not free")
+
+                game.subscribers.add(writer)
+                joined.add(game.game_id)
+                self.send([writer], game.status())
+
+                if seat is not None:
+                    game.join(writer, seat)
+            elif op == "STATE":
+                self.send([writer], game.status())
+            else:
+                if len(args) != 3:
+                    raise ValueError("MOVE takes a game and two tiles")
+
+                a, b = int(args[1]), int(args[2])
+
+                if not (0 <= a < len(game.game.topo.tiles) and 0 <= b < len(game.game.topo.tiles)):
+                    raise ValueError(f"no tile {a} or {b}")
+
+                await game.events.put((NETWORK, (writer, a, b)))
+                return
+        else:
+            self.send([writer], "ERROR " + " ".join(words))
+
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=0, ssl_context=None):
+        self.server = await asyncio.start_server(self.handle, host, port, ssl=ssl_context)
+
+        return self.server.sockets[0].getsockname()
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+        for game_id in list(self.games):
+            await self.close_game(game_id)
+
+
+def server_ssl_context(certfile, keyfile):
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(certfile, keyfile)
+
+    return context
+
+
+class LoopbackWriter:
+    # stands in for a StreamWriter, whatever is written is fed to the peer's reader
+    def __init__(self, peer):
+        self.peer = peer
+        self.closed = False
+
+    def write(self, data):
+        if not self.closed:
+            self.peer.feed_data(data)
+
+    async def drain(self):
+        await asyncio.sleep(0)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.peer.feed_eof()
+
+    def is_closing(self):
+        return self.closed
+
+    async def wait_closed(self):
+        pass
+
+    def get_extra_info(self, name, default=None):
+        return default
+
+
+def open_loopback(server):
+    client_reader = asyncio.StreamReader()
+    server_reader = asyncio.StreamReader()
+
+    client_writer = LoopbackWriter(server_reader)
+    server_writer = LoopbackWriter(client_reader)
+
+    asyncio.ensure_future(server.handle(server_reader, server_writer))
+
+    return client_reader, client_writer
+
+
+async def serve(host="127.0.0.1", port=8765, certfile=None, keyfile=None):
+    context = server_ssl_context(certfile, keyfile) if certfile else None
+    server = GameServer()
+
+    await server.start(host, port, context)
+    await server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
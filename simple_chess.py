@@ -1,120 +1,93 @@
-import queue
 import tkinter as tk
-import numpy as np
 import threading
-import itertools as itr
+
+import numpy as np
+
+from engine import *
+from events import EventQueue, dispatch, CLICK, NETWORK, TIMER, USER
+from layout import layouts
 
 
-class SimpleChess:
+class SimpleChess(HeadlessChess):
     def __init__(self):
+        HeadlessChess.__init__(self)
+
         self.root = None
-        self.topo = None
         self.topo_widget = None
-        self.turn = 0
         self.clicked = None
-        self.cond = None
-        self.interrupt = None
+        self.events = EventQueue()
         self.running = False
-        self.chess_state = None
         self.ibuf = None
 
+        self.handlers = {
+            CLICK: self.on_click,
+            NETWORK: self.on_network,
+            TIMER: self.on_timer,
+            USER: self.on_user,
+        }
+
     def do_root(self):
         self.root = tk.Tk()
         self.root.geometry("600x600")
 
-    def set_topo(self, topo):
-        self.topo = topo
-
     def do_topo_widget(self):
         self.topo_widget = TopoWidget(self, self.root, self.topo)
         self.topo_widget.layout()
         self.topo_widget.pack(expand=True, fill=tk.BOTH)
 
+        self.add_observer(self.topo_widget)
+
     def click(self, tile):
-        self.interrupt_game(("click", tile))
+        self.interrupt_game((CLICK, tile))
 
     def set_input_buffer(self, ibuf):
         self.ibuf = ibuf
         self.ibuf.game = self
-        self.ibuf.display = self.topo_widget
-        self.ibuf.target = self.chess_state
 
     def game_thread(self):
         self.running = True
 
-        self.cond = threading.Condition()
+        while self.running:
+            dispatch(self.events.get_batch(), self.handlers)
+
+    def on_click(self, tile):
+        self.ibuf.put(tile)
 
-        with self.cond:
-            while self.running:
-                self.cond.wait()
+    def on_network(self, move):
+        self.move(*move)
 
-                if self.interrupt[0] == "click":
-                    self.ibuf.put(self.interrupt[1])
+    def on_timer(self, callback):
+        callback()
 
-    def load_chess_state(self, state):
-        state.topo = self.topo
-        self.chess_state = state
+    def on_user(self, command):
+        if command == "quit":
+            self.running = False
+            self.events.close()
 
     def interrupt_game(self, interrupt):
-        with self.cond:
-            self.interrupt = interrupt
-            self.cond.notify()
+        self.events.put(interrupt)
 
     def run(self):
         threading.Thread(target=self.game_thread).start()
 
         self.root.mainloop()
 
+        self.interrupt_game((USER, "quit"))
+
 
 class SelectMoveBuffer:
     def __init__(self):
         self.game = None
         self.buf = None
-        self.target = None
-        self.display = None
 
     def put(self, click):
         if self.buf:
-            self.display.colour(self.buf, "gray")
-            self.target.move(self.buf, click)
+            self.game.deselect(self.buf)
+            self.game.move(self.buf, click)
             self.buf = None
-            self.game.root.after(0, self.display.draw)
         else:
             self.buf = click
-            self.display.colour(click, "red")
-
-
-class Topology:
-    def __init__(self, tiles, atlas):
-        self.tiles = tiles
-        self.atlas = atlas
-        self.circle = 2 * np.pi
-        self.epsilon = 1e-5
-
-    def get_charts(self, tile):
-        return [chart for chart in self.atlas if tile in chart.tiles]
-
-    def angle(self, a, b):
-        return np.arccos(np.dot(a, b) / np.linalg.norm(a) / np.linalg.norm(b))
-
-    def is_angle(self, a, b, circle_frac):
-        return abs(self.angle(a, b) / self.circle - circle_frac) < self.epsilon
-
-
-class Chart:
-    def __init__(self, base, tiles):
-        self.base = base
-        self.tiles = tiles
-
-
-class Tile:
-    def __init__(self):
-        self.piece = None
-        self.neighs = {}
-
-    def add_neigh(self, neigh, vector):
-        self.neighs[neigh] = vector
-        neigh.neighs[self] = -vector
+            self.game.select(click)
 
 
 class TopoWidget(tk.Canvas):
@@ -125,6 +98,7 @@ class TopoWidget(tk.Canvas):
         self.topo = topo
         self.charts = None
         self.atlas_to_widgets = {}
+        self.tile_items = {}
 
     def layout(self):
         self.bind("<Expose>", self.draw)
@@ -154,9 +128,32 @@ class TopoWidget(tk.Canvas):
             if chart:
                 chart.draw()
 
+    def register_items(self, widget):
+        # tile -> {chart widget: oval item}, refreshed whenever a chart widget lays itself out
+        for items in self.tile_items.values():
+            items.pop(widget, None)
+
+        for tile, item in widget.tile_to_item.items():
+            self.tile_items.setdefault(tile, {})[widget] = item
+
     def colour(self, tile, c):
-        for chart in self.topo.get_charts(tile):
-            self.atlas_to_widgets[chart].colour(tile, c)
+        for widget, item in self.tile_items.get(tile, {}).items():
+            widget.itemconfig(item, fill=c)
+
+    def update_tiles(self, tiles):
+        for tile in tiles:
+            for widget in self.tile_items.get(tile, {}):
+                widget.update_tile(tile)
+
+    # observer callbacks, these arrive on the game thread so they are handed to the tk loop
+    def selected(self, tile):
+        self.after(0, self.colour, tile, "red")
+
+    def deselected(self, tile):
+        self.after(0, self.colour, tile, "gray")
+
+    def moved(self, a, b):
+        self.after(0, self.update_tiles, [a, b])
 
 
 class ChartWidget(tk.Canvas):
@@ -165,255 +162,69 @@ class ChartWidget(tk.Canvas):
 
         self.game = game
         self.chart = chart
-        self.drawn_tiles = {}
+        self.chart_layout = None
         self.tile_to_item = {}
+        self.tile_to_text = {}
+        self.edge_to_item = {}
+        self.size = None
 
     def setup(self):
         self.config(bd=1, highlightbackground="black", highlightcolor="black")
         self.bind("<Button-1>", self.send_tile)
+        self.bind("<Configure>", self.draw)
 
     def send_tile(self, event):
-        x, y = event.x, event.y
+        # hit-tested against the layout's tile index rather than the canvas items
+        tile = self.chart_layout.tile_at(event.x, event.y) if self.chart_layout else None
 
-        items = self.find_overlapping(x, y, x, y)
-        items = [item for item in items if item in self.drawn_tiles]
-
-        if items:
-            self.game.click(self.drawn_tiles[items[0]])
+        if tile is not None:
+            self.game.click(tile)
 
     def colour(self, tile, c):
         self.itemconfig(self.tile_to_item[tile], fill=c)
 
-    def draw(self):
-        self.delete("all")
-
-        self.drawn_tiles = {}
-
-        dr = 40
-        R = dr / 4
-        dx, dy = self.winfo_width() / 2, self.winfo_height() / 2
-
-        base = self.chart.base
-        tiles = self.chart.tiles
-        visited = []
-
-        q = queue.Queue()
-        q.put((base, dx, dy))
-        visited += [base]
-
-        while not q.empty():
-            current, x, y = q.get()
-
-            item = self.create_oval(x - R, y - R, x + R, y + R, outline="black", fill="gray")
-            self.drawn_tiles[item] = current
-            self.tile_to_item[current] = item
-
-            if current.piece:
-                piece = current.piece
-                c = "black" if piece.owner == 1 else "white"
-
-                self.create_text(x, y, text=piece.shape, fill=c)
-
-            for neigh in current.neighs:
-                dx, dy = dr * current.neighs[neigh][:2]
-
-                dl = np.sqrt(dx ** 2 + dy ** 2)
-
-                x1 = x + R * dx / dl
-                y1 = y + R * dy / dl
-                x2 = x + dx - R * dx / dl
-                y2 = y + dy - R * dy / dl
-
-                self.create_line(x1, y1, x2, y2, fill="black")
-
-                if neigh in tiles and neigh not in visited:
-                    visited += [neigh]
-                    q.put((neigh, x + dx, y + dy))
-
-
-class ChessState:
-    def __init__(self, game):
-        self.topo = None
-        self.limit = 100
-        self.game = game
-
-    def get_moves(self, a, piece):
-        return itr.islice(piece_move_iter(piece, self.topo, a), self.limit)
-
-    def move(self, a, b):
-        piece = a.piece
+    def update_tile(self, tile):
+        item = self.tile_to_text.get(tile)
 
-        if not piece:
+        if item is None:
             return
 
-        if piece.owner != self.game.turn:
-            return
-
-        if b in self.get_moves(a, piece):
-            a.piece = None
-            b.piece = piece
-
-            self.game.turn = 1 - self.game.turn
-
-
-def piece_move_iter(piece, topo, tile):
-    if piece.shape == "K":
-        return king_move_iter(piece, topo, tile)
-    elif piece.shape == "Q":
-        return queen_move_iter(piece, topo, tile)
-    elif piece.shape == "R":
-        return rook_move_iter(piece, topo, tile)
-    elif piece.shape == "B":
-        return bishop_move_iter(piece, topo, tile)
-    elif piece.shape == "k":
-        return knight_move_iter(piece, topo, tile)
-    elif piece.shape == "p":
-        return pawn_move_iter(piece, topo, tile)
-
-
-class Piece:
-    def __init__(self, shape, owner):
-        self.shape = shape
-        self.owner = owner
-
-
-def king_move_iter(piece, topo, tile):
-    yield from tile.neighs
-
-
-def queen_move_iter(piece, topo, tile):
-    q = queue.Queue()
-
-    for neigh in tile.neighs:
-        q.put((neigh, neigh.neighs[tile]))
-
-    while not q.empty():
-        tile, vec_in = q.get()
-
-        yield tile
-
-        for neigh, vec_out in tile.neighs.items():
-            if topo.is_angle(vec_in, vec_out, 0.5):
-                q.put((neigh, neigh.neighs[tile]))
-
-
-def rook_move_iter(piece, topo, tile):
-    q = queue.Queue()
-
-    def angles(vec_out):
-        return topo.is_angle(vec_out, [1, 0], 0)\
-            or topo.is_angle(vec_out, [1, 0], 0.25)\
-            or topo.is_angle(vec_out, [1, 0], 0.5)
-
-    for neigh, vec_out in tile.neighs.items():
-        if angles(vec_out):
-            q.put((neigh, neigh.neighs[tile]))
-
-    while not q.empty():
-        tile, vec_in = q.get()
-
-        yield tile
-
-        for neigh, vec_out in tile.neighs.items():
-            if angles(vec_out) and topo.is_angle(vec_in, vec_out, 0.5):
-                q.put((neigh, neigh.neighs[tile]))
-
-
-def bishop_move_iter(piece, topo, tile):
-    q = queue.Queue()
+        piece = tile.piece
 
-    def angles(vec_out):
-        return topo.is_angle(vec_out, [1, 0], 1 / 8) \
-               or topo.is_angle(vec_out, [1, 0], 3 / 8)
-
-    for neigh, vec_out in tile.neighs.items():
-        if angles(vec_out):
-            q.put((neigh, neigh.neighs[tile]))
-
-    while not q.empty():
-        tile, vec_in = q.get()
-
-        yield tile
-
-        for neigh, vec_out in tile.neighs.items():
-            if angles(vec_out) and topo.is_angle(vec_in, vec_out, 0.5):
-                q.put((neigh, neigh.neighs[tile]))
-
-
-def knight_move_iter(piece, topo, tile):
-    for step1 in tile.neighs:
-        vec_in1 = step1.neighs[tile]
-
-        for step2, vec_out1 in step1.neighs.items():
-            if not topo.is_angle(vec_in1, vec_out1, 0.5):
-                continue
-
-            vec_in2 = step2.neighs[step1]
-
-            for end, vec_out2 in step2.neighs.items():
-                if topo.is_angle(vec_in2, vec_out2, 0.25):
-                    yield end
-
-
-def pawn_move_iter(piece, topo, tile):
-    for neigh, vec in tile.neighs.items():
-        m = 1 if piece.owner == 0 else -1
-
-        if topo.is_angle(vec, [0, m], 0.0) and not neigh.piece:
-            yield neigh
-        elif 0 < topo.angle(vec, [0, m]) / topo.circle < 0.25 and neigh.piece:
-            yield neigh
-
-
-def create_normal_board():
-    xsize = ysize = 8
-    
-    tiles = np.empty((xsize, ysize), dtype=object)
-
-    for y in range(ysize):
-        for x in range(xsize):
-            tiles[x, y] = tile = Tile()
-
-            if x > 0:
-                tile.add_neigh(tiles[x - 1, y], np.array([-1, 0]))
-
-            if y > 0:
-                tile.add_neigh(tiles[x, y - 1], np.array([0, -1]))
-
-            if x > 0 and y > 0:
-                tile.add_neigh(tiles[x - 1, y - 1], np.array([-1, -1]))
+        if piece:
+            c = "black" if piece.owner == 1 else "white"
+            self.itemconfig(item, text=piece.shape, fill=c)
+        else:
+            self.itemconfig(item, text="")
 
-            if x < xsize - 1 and y > 0:
-                tile.add_neigh(tiles[x + 1, y - 1], np.array([1, -1]))
+    def draw(self, event=None):
+        # the items persist between draws, only a new size needs a new layout
+        size = self.winfo_width(), self.winfo_height()
 
-    for x in range(xsize):
-        tiles[x, 1].piece = Piece("p", 0)
-        tiles[x, 6].piece = Piece("p", 1)
+        if size != self.size:
+            self.size = size
+            self.layout()
 
-    tiles[0, 0].piece = Piece("R", 0)
-    tiles[7, 0].piece = Piece("R", 0)
-    tiles[0, 7].piece = Piece("R", 1)
-    tiles[7, 7].piece = Piece("R", 1)
+    def layout(self):
+        self.delete("all")
 
-    tiles[1, 0].piece = Piece("k", 0)
-    tiles[6, 0].piece = Piece("k", 0)
-    tiles[1, 7].piece = Piece("k", 1)
-    tiles[6, 7].piece = Piece("k", 1)
+        self.tile_to_item = {}
+        self.tile_to_text = {}
+        self.edge_to_item = {}
 
-    tiles[2, 0].piece = Piece("B", 0)
-    tiles[5, 0].piece = Piece("B", 0)
-    tiles[2, 7].piece = Piece("B", 1)
-    tiles[5, 7].piece = Piece("B", 1)
+        self.chart_layout = layout = layouts.get(self.game.topo, self.chart, self.size)
+        R = layout.radius
 
-    tiles[3, 0].piece = Piece("Q", 0)
-    tiles[4, 0].piece = Piece("K", 0)
-    tiles[3, 7].piece = Piece("Q", 1)
-    tiles[4, 7].piece = Piece("K", 1)
+        for tile, (x, y) in layout.positions.items():
+            item = self.create_oval(x - R, y - R, x + R, y + R, outline="black", fill="gray")
+            self.tile_to_item[tile] = item
+            self.tile_to_text[tile] = self.create_text(x, y, text="")
+            self.update_tile(tile)
 
-    centre = tiles[xsize // 2, ysize // 2]
-    tiles = tiles.flatten()
+        for tile, neigh, x1, y1, x2, y2 in layout.segments:
+            self.edge_to_item[tile, neigh] = self.create_line(x1, y1, x2, y2, fill="black")
 
-    return Topology(tiles, [Chart(centre, tiles)])
+        self.master.register_items(self)
 
 
 def do_simple_chess():
@@ -434,4 +245,5 @@ def do_simple_chess():
     game.run()
 
 
-do_simple_chess()
+if __name__ == "__main__":
+    do_simple_chess()
@@ -0,0 +1,101 @@
+import random
+import unittest
+
+from engine import ChessState, Piece, NORMAL_RULES, create_normal_board
+from ruleset import Ruleset
+from search import AnalysisGame
+
+
+class LegalRulesTest(unittest.TestCase):
+    def setUp(self):
+        self.rules = Ruleset(NORMAL_RULES + ("no_self_capture",))
+        self.topo = create_normal_board()
+        self.state = ChessState(AnalysisGame(), self.rules)
+        self.state.topo = self.topo
+
+    def targets(self, state):
+        return {tile: set(state.targets(tile)) for tile in state.reach}
+
+    def rebuilt(self):
+        fresh = ChessState(AnalysisGame(self.state.game.turn), self.rules)
+        fresh.topo = self.topo
+        fresh.setup()
+
+        return self.targets(fresh)
+
+    def test_blocker_moves_away(self):
+        tiles = self.topo.tiles
+
+        for a, b in [(1, 2), (6, 5), (2, 3), (5, 4)]:
+            self.assertTrue(self.state.move(tiles[a], tiles[b]))
+
+        # the rook on 0 was held back by its own pawn on 1, which has now left 2 free as well
+        self.assertEqual(set(self.state.targets(tiles[0])), {tiles[1], tiles[2]})
+        self.assertTrue(self.state.is_legal(tiles[0], tiles[2]))
+        self.assertFalse(self.state.is_legal(tiles[0], tiles[8]))
+
+    def test_incremental_matches_rebuild(self):
+        state = self.state
+        state.setup()
+        rng = random.Random(3)
+        undo = []
+
+        for _ in range(300):
+            moves = [(a, b) for a in state.reach if a.piece.owner == state.game.turn for b in state.targets(a)]
+
+            if undo and (rng.random() < 0.3 or state.winner is not None or not moves):
+                state.unmake_move(undo.pop())
+            elif moves and state.winner is None:
+                undo.append(state.make_move(*rng.choice(moves)))
+
+            self.assertEqual(self.targets(state), self.rebuilt())
+
+
+class LastKingTest(unittest.TestCase):
+    def setUp(self):
+        self.topo = create_normal_board()
+        self.state = ChessState(AnalysisGame())
+        self.state.topo = self.topo
+        self.state.setup()
+
+    def test_taking_own_last_king_loses(self):
+        tiles = self.topo.tiles
+
+        # the white queen on 24 takes the white king next to it
+        undo = self.state.make_move(tiles[24], tiles[32])
+        self.assertEqual(self.state.winner, 1)
+        self.assertIsNone(self.state.make_move(tiles[6], tiles[5]))
+
+        self.state.unmake_move(undo)
+        self.assertIsNone(self.state.winner)
+
+    def test_taking_other_last_king_wins(self):
+        tiles = self.topo.tiles
+        rook, king = tiles[0].piece, tiles[39].piece
+
+        for tile in tiles:
+            tile.piece = None
+
+        # a white rook on the open b file and the only black king at its end
+        tiles[8].piece, tiles[15].piece, tiles[32].piece = rook, king, Piece("K", 0)
+        self.state.setup()
+
+        self.assertTrue(self.state.move(tiles[8], tiles[15]))
+        self.assertEqual(self.state.winner, 0)
+
+    def test_kings_follow_the_rules(self):
+        tiles = self.topo.tiles
+        self.assertEqual(self.state.kings, [{tiles[32]}, {tiles[39]}])
+
+        # without last_king no shape is royal, so no king is tracked and taking one ends nothing
+        state = ChessState(AnalysisGame(), Ruleset(("king", "queen")))
+        state.topo = self.topo
+        state.setup()
+        self.assertEqual(state.kings, [set(), set()])
+
+        self.assertIsNotNone(state.make_move(tiles[24], tiles[32]))
+        self.assertIsNone(state.winner)
+
+
+if __name__ == "__main__":
+    unittest.main()
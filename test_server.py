@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+
+from events import NETWORK
+from server import GameServer, open_loopback
+
+
+class ServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = GameServer()
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+
+    async def ask(self, reader, writer, line):
+        writer.write((line + "\n").encode())
+
+        return await self.answer(reader)
+
+    async def answer(self, reader):
+        return (await asyncio.wait_for(reader.readline(), 1)).decode().strip()
+
+    async def test_moves(self):
+        reader, writer = open_loopback(self.server)
+
+        self.assertEqual(await self.ask(reader, writer, "NEW"), "GAME 0")
+        self.assertEqual(await self.ask(reader, writer, "JOIN 0"), "STATE 0 0 -")
+        self.assertEqual(await self.ask(reader, writer, "MOVE 0 1 2"), "MOVED 0 1 2")
+        self.assertEqual(await self.ask(reader, writer, "MOVE 0 1 2"), "ILLEGAL 0 1 2")
+        self.assertEqual(await self.ask(reader, writer, "MOVE 0 6 5"), "MOVED 0 6 5")
+        self.assertEqual(await self.ask(reader, writer, "STATE 0"), "STATE 0 0 -")
+
+    async def test_bad_input(self):
+        reader, writer = open_loopback(self.server)
+        await self.ask(reader, writer, "NEW")
+
+        lines = ["MOVE 0 6 9999", "MOVE 0 -1 2", "MOVE 0 1 x", "MOVE 0 1", "MOVE 0 1 2 3", "MOVE 7 1 2", "JOIN", "HELLO"]
+
+        for line in lines:
+            self.assertEqual(await self.ask(reader, writer, line), "ERROR " + line)
+
+        # the game still takes moves afterwards
+        self.assertEqual(await self.ask(reader, writer, "MOVE 0 1 2"), "MOVED 0 1 2")
+
+    async def test_failing_handler(self):
+        reader, writer = open_loopback(self.server)
+        await self.ask(reader, writer, "NEW")
+
+        # an event that gets past command() and still raises costs only itself
+        await self.server.games[0].events.put((NETWORK, (writer, 1, 9999)))
+        self.assertEqual(await self.ask(reader, writer, "MOVE 0 1 2"), "MOVED 0 1 2")
+
+    async def test_blind(self):
+        white = open_loopback(self.server)
+        black = open_loopback(self.server)
+        other = open_loopback(self.server)
+
+        self.assertEqual(await self.ask(*white, "NEW BLIND"), "GAME 0")
+        self.assertEqual(await self.ask(*white, "JOIN 0 0"), "STATE 0 0 -")
+        self.assertTrue((await self.answer(white[0])).startswith("SEEN 0 0 "))
+        self.assertEqual(await self.ask(*black, "JOIN 0 1"), "STATE 0 0 -")
+        self.assertTrue((await self.answer(black[0])).startswith("SEEN 0 0 "))
+
+        # taken seats, a second seat and spectators are refused
+        self.assertEqual(await self.ask(*other, "JOIN 0 0"), "ERROR JOIN 0 0")
+        self.assertEqual(await self.ask(*white, "JOIN 0 1"), "ERROR JOIN 0 1")
+        self.assertEqual(await self.ask(*other, "WATCH 0"), "ERROR WATCH 0")
+
+        # black cannot move white's pieces, nor can someone without a seat
+        self.assertEqual(await self.ask(*black, "MOVE 0 1 2"), "ILLEGAL 0 1 2")
+        self.assertEqual(await self.ask(*other, "MOVE 0 1 2"), "ILLEGAL 0 1 2")
+
+        # each player hears only about their own view, black sees nothing of a move in white's corner
+        white[1].write(b"MOVE 0 1 2\n")
+        self.assertTrue((await self.answer(white[0])).startswith("SEEN 0 1 "))
+        self.assertEqual(await self.answer(black[0]), "SEEN 0 1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from compact import CompactTopology, FIELDS
+
+
+# [header][entry per array][arrays, each aligned to ALIGN bytes]; bump VERSION whenever the layout of the file
+# or the meaning of the compiled arrays changes, older files are then rebuilt
+MAGIC = b"CHTP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")
+ENTRY = struct.Struct("<16s8sB3xQQQQ")
+ALIGN = 64
+
+DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "chess-topologies")
+
+
+def save(path, compact, **extra):
+    # writes the topology and any extra arrays (such as tile positions) to path, atomically
+    arrays = dict(compact.arrays(), **extra)
+
+    if len(arrays) > 0xffff or any(np.ndim(a) > 3 for a in arrays.values()):
+        raise ValueError("can only store up to 65535 arrays of at most 3 dimensions")
+
+    # the entry has room for 16 bytes of name and 8 of dtype, anything longer would be cut off silently
+    for name, a in arrays.items():
+        if len(name.encode()) > 16 or len(np.asarray(a).dtype.str) > 8 or np.asarray(a).dtype.hasobject:
+            raise ValueError(f"cannot store array {name!r} of type {np.asarray(a).dtype}")
+
+    offset = HEADER.size + ENTRY.size * len(arrays)
+    entries = []
+
+    for name, a in arrays.items():
+        a = np.ascontiguousarray(a)
+        offset = -(-offset // ALIGN) * ALIGN
+        shape = a.shape + (0,) * (3 - a.ndim)
+        entries.append((name, a, ENTRY.pack(name.encode(), a.dtype.str.encode(), a.ndim, *shape, offset)))
+        offset += a.nbytes
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(arrays), compact.fingerprint))
+
+            for _, _, entry in entries:
+                file.write(entry)
+
+            for name, a, entry in entries:
+                file.seek(ENTRY.unpack(entry)[-1])
+                file.write(a.tobytes())
+
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def load(path):
+    # returns the topology and a dict of the extra arrays, all of them read-only views of one memory map
+    # anything short, cut off or foreign raises ValueError, so that cached() rebuilds it
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is too short for a topology file")
+
+    magic, version, count, fingerprint = HEADER.unpack_from(data)
+
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} topology file")
+
+    if len(data) < HEADER.size + count * ENTRY.size:
+        raise ValueError(f"{path} is cut off in its array entries")
+
+    arrays = {}
+
+    for k in range(count):
+        name, dtype, ndim, *shape, offset = ENTRY.unpack_from(data, HEADER.size + k * ENTRY.size)
+
+        try:
+            name = name.rstrip(b"\0").decode()
+            dtype = np.dtype(dtype.rstrip(b"\0").decode())
+        except (TypeError, ValueError):
+            raise ValueError(f"{path} has a broken entry {k}")
+
+        shape = tuple(shape[:ndim])
+
+        if ndim > 3 or dtype.hasobject or offset + dtype.itemsize * int(np.prod(shape)) > len(data):
+            raise ValueError(f"{path} is cut off in array {name}")
+
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=data, offset=offset)
+
+    if any(name not in arrays for name in FIELDS):
+        raise ValueError(f"{path} is missing topology arrays")
+
+    compact = CompactTopology(**{name: arrays.pop(name) for name in FIELDS}, fingerprint=fingerprint)
+
+    return compact, arrays
+
+
+def cache_key(builder, args, kwargs):
+    params = repr((builder.__module__, builder.__qualname__, args, sorted(kwargs.items())))
+
+    return hashlib.blake2b(params.encode(), digest_size=8).hexdigest()
+
+
+def cached(builder, *args, directory=None, **kwargs):
+    # builder(*args, **kwargs) returns a CompactTopology, or a tuple of one and extra arrays like discretize;
+    # the result is stored under the builder and its parameters and memory mapped on every later call
+    path = os.path.join(directory or DIRECTORY, f"{builder.__name__}-{cache_key(builder, args, kwargs)}.topo")
+
+    if os.path.exists(path):
+        try:
+            compact, extra = load(path)
+        except (ValueError, struct.error, TypeError):
+            pass
+        else:
+            return (compact, *[extra[f"extra{k}"] for k in range(len(extra))]) if extra else compact
+
+    result = builder(*args, **kwargs)
+
+    if isinstance(result, tuple):
+        save(path, result[0], **{f"extra{k}": a for k, a in enumerate(result[1:])})
+    else:
+        save(path, result)
+
+    return result